@@ -1,28 +1,74 @@
+import asyncio
+import contextvars
+import itertools
 import os
-from fastapi import FastAPI, Query, Request
-from fastapi.responses import FileResponse, JSONResponse
+import tempfile
+import threading
+from fastapi import FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
+from starlette.background import BackgroundTask
 import uuid
-from typing import Literal
+from typing import AsyncIterator, BinaryIO, Iterator, Literal, Optional
 
 from mangum import Mangum  # adapter for serverless
 
-from src.create_pdf import create_pdf, PdfRequest
-from src.create_preview import create_preview, JpgRequest
+# the render modules (reportlab, PIL, qrcode, requests, pypdf) are imported on first use, see /api/warmup
+from src.FormatClasses import BulkPreviewRequest, JpgRequest, PdfRequest, RenderReport, Selection, SpriteIndex
+from src.FormatClasses.JpgRequest import PREVIEW_DPI, PREVIEW_MEDIA_TYPES
+from src.Helper.CardCache import CardCache
+from src.Helper.Metrics import Metrics
+from src.Helper.ResponseCache import ResponseCache
+from src.Helper.RosterReader import RosterReader
+from src.Helper.Warmup import Warmup
+from src.jobs import JobManager, JobQueueFull, JobStatus, RenderExecutor, RenderQueueFull
 import logging
-logging.basicConfig(level=logging.DEBUG)
-logger = logging.getLogger(__name__)
+logger = logging.getLogger(__name__)  # configured by the runtime, e.g. LOG_LEVEL on uvicorn
 logger.debug("Handler initialized")
 
+SPOOL_MAX_SIZE = 16 * 1024 ** 2  # rendered files are kept in memory up to this size, larger ones spill to disk
+STREAM_CHUNK_SIZE = 64 * 1024
+METRICS_ENABLED = os.environ.get("RENDER_METRICS", "1") != "0"  # per-phase timings and counters of every render
+# opt-in: > 1 rasterizes bulk previews in worker processes, which serverless runtimes (Vercel, Lambda) do not support
+PREVIEW_WORKERS = int(os.environ.get("RENDER_PREVIEW_WORKERS", 1))
+# opt-in for the same reason: > 1 renders the pages of large Label PDFs in worker processes
+LABEL_WORKERS = int(os.environ.get("RENDER_WORKERS", 1))
+# bounded-memory mode for large rosters: pages are flushed to disk once they hold this much, 0 disables it
+MEMORY_LIMIT = int(float(os.environ.get("RENDER_MEMORY_LIMIT_MB", 0)) * 1024 ** 2) or None
+SPRITE_HEADERS = ["X-Sprite-Count", "X-Sprite-Columns", "X-Sprite-Tile-Width", "X-Sprite-Tile-Height"]
+
+# opt-in: rendered cards are reused between requests, only changed persons are drawn again. Pays off for rosters
+# rendered repeatedly with few changes, a first render is slower (see benchmarks/bench_incremental.py)
+card_cache = CardCache() if os.environ.get("RENDER_CARD_CACHE", "0") != "0" else None
+# identical requests (e.g. after a reload) are answered from the cache or with 304 if the client sends the ETag
+response_cache = ResponseCache(use_disk=os.environ.get("RENDER_RESPONSE_CACHE_DISK", "0") != "0",
+                               max_memory_bytes=int(os.environ.get("RENDER_RESPONSE_CACHE_MB", 64)) * 1024 ** 2,
+                               max_age=float(os.environ.get("RENDER_RESPONSE_CACHE_TTL", 600))) \
+    if os.environ.get("RENDER_RESPONSE_CACHE", "1") != "0" else None
+
+# loads the render modules, assets and fonts in the background instead of within the first request
+if os.environ.get("RENDER_WARMUP", "0") != "0":
+    threading.Thread(target=Warmup.run, daemon=True).start()
+
+# renders of the synchronous endpoints run here, off the event loop; a burst beyond the queue is answered with 429
+render_executor = RenderExecutor(max_workers=int(os.environ.get("RENDER_EXECUTOR_WORKERS", os.cpu_count() or 1)),
+                                 max_queue=int(os.environ.get("RENDER_EXECUTOR_QUEUE_SIZE", 8)))
+
+job_manager = JobManager(workers=int(os.environ.get("RENDER_JOB_WORKERS", 1)),
+                         max_queue=int(os.environ.get("RENDER_JOB_QUEUE_SIZE", 16)),
+                         record_metrics=METRICS_ENABLED, memory_limit=MEMORY_LIMIT, label_workers=LABEL_WORKERS)
+
 app = FastAPI()
 
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000"],  # Adjust as needed
-    allow_methods=["POST", "OPTIONS"],
+    allow_methods=["GET", "POST", "OPTIONS"],
     allow_headers=["Content-Type"],
+    # the client needs them to revalidate, to cut the sprite sheet, to tell which photos are missing and for statistics
+    expose_headers=["ETag", "X-Placeholders", "X-Deduplicated-Bytes", "X-Cards-Reused", *SPRITE_HEADERS],
     allow_credentials=True  # Set to True if credentials are needed
 )
 
@@ -35,21 +81,296 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
         content={"detail": exc.errors(), "body": exc.body},
     )
 
+@app.exception_handler(RenderQueueFull)
+async def render_queue_full_handler(request: Request, exc: RenderQueueFull):
+    if METRICS_ENABLED:
+        Metrics.totals.add_count("renders_rejected")
+    return JSONResponse(status_code=429, content={"detail": str(exc)},
+                        headers={"Retry-After": str(exc.retry_after)})
+
+def stream_file(buffer: BinaryIO, media_type: str, filename: str) -> StreamingResponse:
+    """
+    Streams the rendered buffer back and closes it (removing any spooled temp file) once the response is sent.
+    """
+    def iter_chunks():
+        buffer.seek(0)
+        while chunk := buffer.read(STREAM_CHUNK_SIZE):
+            yield chunk
+
+    return StreamingResponse(iter_chunks(),
+                             media_type=media_type,
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+                             background=BackgroundTask(buffer.close))
+
+def cached_response(key: str, if_none_match: Optional[str], media_type: str, filename: str) -> Optional[Response]:
+    """
+    :return: 304 if the client holds the cached response, else the cached response, None if it has to be rendered
+    """
+    if response_cache is None or (content := response_cache.get(key)) is None:
+        return None
+
+    headers = {"ETag": ResponseCache.etag(key), "X-Cache": "hit"}
+    if ResponseCache.matches(if_none_match, key):
+        if METRICS_ENABLED:
+            Metrics.totals.add_count("responses_not_modified")
+        return Response(status_code=304, headers=headers)
+    if METRICS_ENABLED:
+        Metrics.totals.add_count("responses_cached")
+    return Response(content, media_type=media_type,
+                    headers={**headers, "Content-Disposition": f'attachment; filename="{filename}"'})
+
+def cache_response(key: str, buffer: BinaryIO, response: Response):
+    if response_cache is not None:
+        response_cache.store(key, buffer)
+        response.headers["ETag"] = ResponseCache.etag(key)
+        response.headers["X-Cache"] = "miss"
+
 @app.post("/api/generate-pdf/")
 async def generate_pdf(
         data: PdfRequest,
-        paper_size: Literal["A4", "Label"] = Query("Label")
+        paper_size: Literal["A4", "Label"] = Query("Label"),
+        index: list[int] = Query([]),
+        personnel_nr: list[str] = Query([]),
+        pages: Optional[str] = Query(None),
+        if_none_match: Optional[str] = Header(None)
 ):
+    """
+    Renders the roster or, e.g. to reprint single cards, a subset of it: persons by index (repeatable), by
+    personnel_nr (repeatable) and/or the persons on a page range of the whole document (e.g. pages=3-5). On A4 the
+    selected cards are packed onto as few sheets as possible.
+    """
     filename = f"{uuid.uuid4()}.pdf"
-    pdf_path = create_pdf(data, paper_size, filename)
-    response = FileResponse(pdf_path, media_type="application/pdf", filename=filename)
+    key = ResponseCache.key("pdf", data, paper_size=paper_size, index=index, personnel_nr=personnel_nr, pages=pages)
+    if (cached := cached_response(key, if_none_match, "application/pdf", filename)) is not None:
+        return cached
+
+    selection = None
+    if index or personnel_nr or pages:
+        try:
+            selection = Selection(index, personnel_nr, Selection.parse_pages(pages) if pages else None)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+
+    def render():
+        # imported lazily, loads the whole render stack (on the render thread, not the event loop)
+        from src.create_pdf import create_pdf, select_persons
+
+        roster = data
+        if selection is not None:
+            try:
+                roster = data.model_copy(update={"persons": select_persons(data.persons, paper_size, selection)})
+            except ValueError as e:
+                raise HTTPException(status_code=422, detail=str(e))
+        with Metrics.record(METRICS_ENABLED) as recorded:
+            create_pdf(roster, paper_size, buffer, report=report, card_cache=card_cache, memory_limit=MEMORY_LIMIT,
+                       workers=LABEL_WORKERS)
+        return recorded
+
+    report = RenderReport()
+    buffer = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    metrics = await render_executor.run(render)
+    response = stream_file(buffer, "application/pdf", filename)
+    # a document with placeholders is rendered again, the missing photos may be available by then
+    if not report.placeholders:
+        cache_response(key, buffer, response)
+    response.headers["X-Deduplicated-Bytes"] = str(report.deduplicated_bytes)
+    response.headers["X-Cards-Reused"] = str(report.cards_reused)
+    response.headers["X-Placeholders"] = ",".join(report.placeholders)
+    if metrics is not None:
+        response.headers["Server-Timing"] = metrics.server_timing()
     return response
 
+@app.post("/api/generate-pdf/stream")
+async def generate_pdf_stream(
+        request: Request,
+        paper_size: Literal["A4", "Label"] = Query("Label"),
+        fmt: Literal["ndjson", "csv"] = Query("ndjson")
+):
+    """
+    Renders a roster export (NDJSON or CSV, see RosterReader) page group by page group and streams the PDF while the
+    remaining persons are still read and rendered. An invalid person of the first page group is answered with 422, an
+    invalid later one aborts the stream.
+    """
+    # the roster is parsed while it is uploaded, persons are read by the thread rendering them
+    body_complete = asyncio.Event()
+    persons = RosterReader.read(request_lines(request, asyncio.get_running_loop(), body_complete), fmt)
+
+    def render() -> Iterator[bytes]:
+        # imported lazily, loads the whole render stack (on the render thread, not the event loop)
+        from src.create_pdf import create_pdf_stream
+
+        if (first := next(persons, None)) is None:
+            raise HTTPException(status_code=422, detail="Roster is empty")
+        yield from create_pdf_stream(itertools.chain([first], persons), paper_size)
+
+    # holds a render slot until the document is complete, a burst beyond the queue is answered with 429
+    chunks = render_executor.iterate(record_stream(render()))
+    try:
+        first_chunk = await anext(chunks)  # the first page group, so an invalid roster is still answered with 422
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    async def content():
+        yield first_chunk
+        async for chunk in chunks:
+            yield chunk
+
+    return UploadStreamingResponse(content(), body_complete,
+                                   media_type="application/pdf",
+                                   headers={"Content-Disposition": f'attachment; filename="{uuid.uuid4()}.pdf"'})
+
+def request_lines(request: Request, loop: asyncio.AbstractEventLoop, complete: asyncio.Event) -> Iterator[bytes]:
+    """
+    Lines of the request body as they arrive, to be read by a worker thread: every chunk is received on the event
+    loop. Sets complete once the whole body is read.
+    """
+    chunks = request.stream()
+
+    async def receive() -> Optional[bytes]:
+        return await anext(chunks, None)
+
+    pending = b""
+    while (chunk := asyncio.run_coroutine_threadsafe(receive(), loop).result()) is not None:
+        *lines, pending = (pending + chunk).split(b"\n")
+        yield from (line + b"\n" for line in lines)
+    loop.call_soon_threadsafe(complete.set)
+    if pending:
+        yield pending
+
+class UploadStreamingResponse(StreamingResponse):
+    """
+    Streams the response while the request body is still being read (see request_lines). Starlette listens for the
+    client's disconnect on the channel the body arrives on, so listening starts only once the body is complete.
+    """
+    def __init__(self, content: AsyncIterator[bytes], body_complete: asyncio.Event, **kwargs):
+        super().__init__(content, **kwargs)
+        self.body_complete = body_complete
+
+    async def listen_for_disconnect(self, receive):
+        await self.body_complete.wait()
+        await super().listen_for_disconnect(receive)
+
+def record_stream(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    """
+    Records the metrics of a streamed render. Every chunk may be produced by another thread of the pool, so all of
+    them run in the same context, which holds the recording.
+    """
+    context = contextvars.copy_context()
+    recording = Metrics.record(METRICS_ENABLED)
+    context.run(recording.__enter__)
+    try:
+        while (chunk := context.run(next, chunks, None)) is not None:
+            yield chunk
+    finally:
+        context.run(recording.__exit__, None, None, None)
+
 @app.post("/api/generate-preview/")
-async def generate_preview(data: JpgRequest):
+async def generate_preview(
+        data: JpgRequest,
+        dpi: int = Query(PREVIEW_DPI, ge=36, le=600),
+        fmt: Literal["PNG", "JPEG", "WEBP"] = Query("PNG"),
+        if_none_match: Optional[str] = Header(None)
+):
+    filename = f"{uuid.uuid4()}.{fmt.lower()}"
+    key = ResponseCache.key("preview", data, dpi=dpi, fmt=fmt)
+    if (cached := cached_response(key, if_none_match, PREVIEW_MEDIA_TYPES[fmt], filename)) is not None:
+        return cached
+
+    def render():
+        # imported lazily, loads the whole render stack (on the render thread, not the event loop)
+        from src.create_preview import create_preview
+
+        with Metrics.record(METRICS_ENABLED) as recorded:
+            create_preview(data, buffer, dpi=dpi, fmt=fmt)
+        return recorded
+
+    buffer = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    metrics = await render_executor.run(render)
+    response = stream_file(buffer, PREVIEW_MEDIA_TYPES[fmt], filename)
+    cache_response(key, buffer, response)
+    if metrics is not None:
+        response.headers["Server-Timing"] = metrics.server_timing()
+    return response
+
+@app.post("/api/generate-previews/")
+async def generate_previews(
+        data: BulkPreviewRequest,
+        dpi: int = Query(PREVIEW_DPI, ge=36, le=600),
+        fmt: Literal["PNG", "JPEG", "WEBP"] = Query("PNG"),
+        layout: Literal["zip", "sprite"] = Query("zip"),
+        thumb_width: int = Query(None, ge=16, le=4096),
+        thumb_height: int = Query(None, ge=16, le=4096)
+):
+    """
+    Previews of all persons, either as ZIP of one image per person or as one sprite sheet. The position of a card
+    in the sprite sheet is given by the X-Sprite-* headers: card i starts at
+    ((i % columns) * tile width, (i // columns) * tile height).
+    """
     filename = f"{uuid.uuid4()}"
-    jpg_path = create_preview(data, filename)
-    response = FileResponse(jpg_path, media_type="image/png", filename=f"{filename}.png")
+    thumbnail_size = (thumb_width or 4096, thumb_height or 4096) if thumb_width or thumb_height else None
+    sprite_index = SpriteIndex()
+    def render():
+        # imported lazily, loads the whole render stack (on the render thread, not the event loop)
+        from src.create_preview import create_previews
+
+        with Metrics.record(METRICS_ENABLED) as recorded:
+            create_previews(data, buffer, dpi=dpi, fmt=fmt, layout=layout, thumbnail_size=thumbnail_size,
+                            sprite_index=sprite_index, workers=PREVIEW_WORKERS)
+        return recorded
+
+    buffer = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    metrics = await render_executor.run(render)
+    if layout == "zip":
+        response = stream_file(buffer, "application/zip", f"{filename}.zip")
+    else:
+        response = stream_file(buffer, PREVIEW_MEDIA_TYPES[fmt], f"{filename}.{fmt.lower()}")
+        for header, value in zip(SPRITE_HEADERS, (sprite_index.count, sprite_index.columns,
+                                                  sprite_index.tile_width, sprite_index.tile_height)):
+            response.headers[header] = str(value)
+    if metrics is not None:
+        response.headers["Server-Timing"] = metrics.server_timing()
     return response
 
+@app.post("/api/jobs/", status_code=202)
+async def submit_pdf_job(
+        data: PdfRequest,
+        paper_size: Literal["A4", "Label"] = Query("Label")
+):
+    try:
+        job = job_manager.submit(data, paper_size)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "10"})
+    return job.to_dict()
+
+@app.get("/api/jobs/{job_id}")
+async def get_pdf_job(job_id: str):
+    if (job := job_manager.get(job_id)) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@app.get("/api/jobs/{job_id}/pdf")
+async def download_pdf_job(job_id: str):
+    if (job := job_manager.get(job_id)) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status != JobStatus.DONE:
+        raise HTTPException(status_code=409, detail=f"Job is {job.status.value}")
+    return FileResponse(job.pdf_path, media_type="application/pdf", filename=f"{job.id}.pdf")
+
+@app.get("/api/warmup")
+async def warmup():
+    """
+    Loads the render modules, assets and fonts, e.g. called by a scheduled ping to keep a warm instance. Runs in the
+    render executor like a render, it may also wait for a warm-up still running in the background.
+    :return: milliseconds spent per step, empty if the process was warm already
+    """
+    durations = await render_executor.run(Warmup.run)
+    return {step: round(seconds * 1000, 1) for step, seconds in durations.items()}
+
+@app.get("/api/metrics")
+async def get_metrics():
+    """
+    Totals of all renders of this process in the Prometheus text format.
+    """
+    return PlainTextResponse(Metrics.totals.prometheus(), media_type="text/plain; version=0.0.4")
+
 handler = Mangum(app)
@@ -0,0 +1,69 @@
+import threading
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+from PIL import Image, ImageDraw
+
+
+@lru_cache(maxsize=None)
+def synthetic_photo(idx: int, size=(550, 732)) -> bytes:
+    """
+    :return: JPEG with the pixel dimensions of a FeuerOn photo
+    """
+    image = Image.new("RGB", size, ((idx * 37) % 256, (idx * 91) % 256, (idx * 53) % 256))
+    draw = ImageDraw.Draw(image)
+    draw.ellipse((size[0] * 0.2, size[1] * 0.15, size[0] * 0.8, size[1] * 0.6), fill=(230, 200, 170))
+    draw.rectangle((size[0] * 0.1, size[1] * 0.65, size[0] * 0.9, size[1]), fill=(40, 40, 90))
+    stream = BytesIO()
+    image.save(stream, format="JPEG", quality=90)
+    return stream.getvalue()
+
+
+class _PhotoHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        try:
+            idx = int(self.path.strip("/").split(".")[0])
+        except ValueError:
+            self.send_error(404)
+            return
+
+        etag = f'"photo-{idx}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        body = synthetic_photo(idx)
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class PhotoServer:
+    """
+    Local HTTP server serving synthetic photos under '/<idx>.jpg', so benchmarks do not depend on FeuerOn.
+    """
+
+    def __init__(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _PhotoHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,82 @@
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+from benchmarks.PhotoServer import PhotoServer
+from benchmarks.report import write_report
+from benchmarks.roster import generate_roster
+
+DEFAULT_SIZES = [100, 300, 1000]
+
+
+def measure(render, repeat: int) -> tuple[float, int]:
+    """
+    :return: median duration (in s) and size of the output of the render
+    """
+    durations = []
+    for _ in range(repeat):
+        output = BytesIO()
+        start = time.perf_counter()
+        render(output)
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations), output.tell()
+
+
+def run_scenario(paper_size: str, size: int, image_base_url: str, photo_ratio: float, repeat: int) -> dict:
+    """
+    Renders the roster directly and through the card cache, once with an empty cache and once with all cards cached.
+    Photos are fetched before, so only rendering and assembling are measured.
+    """
+    from src.Helper.CardCache import CardCache
+    from src.create_pdf import create_pdf
+
+    data = generate_roster(size, photo_ratio=photo_ratio, image_base_url=image_base_url)
+    create_pdf(data, paper_size, BytesIO())  # photos into the image cache
+
+    direct_s, direct_bytes = measure(lambda output: create_pdf(data, paper_size, output), repeat)
+    caches = []
+
+    def render_cold(output):
+        caches.append(CardCache(tempfile.mkdtemp(), max_memory_items=size))
+        create_pdf(data, paper_size, output, card_cache=caches[-1])
+
+    cold_s, _ = measure(render_cold, repeat)
+    warm_s, incremental_bytes = measure(lambda output: create_pdf(data, paper_size, output, card_cache=caches[-1]),
+                                        repeat)
+    return {"paper_size": paper_size, "size": size,
+            "direct_s": round(direct_s, 4), "cold_s": round(cold_s, 4), "warm_s": round(warm_s, 4),
+            "direct_bytes": direct_bytes, "incremental_bytes": incremental_bytes}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the incremental mode of create_pdf (card cache) against "
+                                                 "rendering directly, with an empty and a filled cache. "
+                                                 "Run from the repository root: python -m benchmarks.bench_incremental")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--paper-sizes", nargs="+", choices=["A4", "Label"], default=["A4", "Label"])
+    parser.add_argument("--photo-ratio", type=float, default=0.5)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per scenario, the median is reported")
+    parser.add_argument("--output", default="bench_incremental.json", help="path of the JSON results")
+    args = parser.parse_args()
+
+    from src.Helper.Warmup import Warmup
+    Warmup.run()
+
+    results = []
+    with PhotoServer() as photo_server:
+        for paper_size in args.paper_sizes:
+            for size in args.sizes:
+                result = run_scenario(paper_size, size, photo_server.base_url, args.photo_ratio, args.repeat)
+                print(f"{paper_size:>5} {size:>5} persons: direct {result['direct_s']:7.3f} s, "
+                      f"cold cache {result['cold_s']:7.3f} s, warm cache {result['warm_s']:7.3f} s, "
+                      f"{result['direct_bytes']:>9} / {result['incremental_bytes']:>9} bytes", file=sys.stderr)
+                results.append(result)
+
+    write_report(args.output, results, photo_ratio=args.photo_ratio)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import argparse
+import statistics
+import sys
+import time
+
+from benchmarks.report import write_report
+from benchmarks.roster import generate_roster
+
+DEFAULT_SIZES = [100, 1000, 5000, 20000]
+
+
+def layout_per_card(persons: list, sheet, card_width, card_height, top_bottom_padding) -> list:
+    """
+    Geometry computed object by object, as cards without a batch layout do: the grid is stepped card by card and
+    every card is placed by its (cached) layout plan.
+    """
+    from src.card.CardDimensions import MM_TO_PT
+    from src.card.LayoutPlan import LayoutPlan
+
+    width, height = card_width * MM_TO_PT, card_height * MM_TO_PT
+    page, x, y = 0, sheet.margin_x, sheet.height - height - sheet.margin_y
+    cards = []
+    for person in persons:
+        if y < sheet.margin_y:
+            page, x, y = page + 1, sheet.margin_x, sheet.height - height - sheet.margin_y
+        plan = LayoutPlan.get(card_width, card_height, top_bottom_padding, "Helvetica",
+                              tuple(i.vehicle for i in person.instructions))
+        cards.append(plan.at(x, y, page))
+
+        x += width + sheet.column_gap
+        if x + width > sheet.width - sheet.margin_x:
+            x, y = sheet.margin_x, y - height - sheet.row_gap
+    return cards
+
+
+def layout_batch(persons: list, sheet, card_width, card_height, top_bottom_padding) -> list:
+    from src.card.BatchLayout import BatchLayout
+
+    return list(BatchLayout(persons, sheet, card_width, card_height, top_bottom_padding))
+
+
+def measure(fn, persons: list, repeat: int) -> float:
+    """
+    :return: median duration (in s) of laying out the persons, memoized layout plans are cleared before every run
+    """
+    from src.card.LayoutPlan import LayoutPlan
+    from src.create_pdf import CARD_HEIGHT, CARD_WIDTH, SHEETS, TOP_BOTTOM_PADDING
+
+    durations = []
+    for _ in range(repeat):
+        LayoutPlan.get.cache_clear()
+        start = time.perf_counter()
+        fn(persons, SHEETS["A4"], CARD_WIDTH, CARD_HEIGHT, TOP_BOTTOM_PADDING)
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the layout of whole rosters on A4 sheets, card by card "
+                                                 "against the batch layout. "
+                                                 "Run from the repository root: python -m benchmarks.bench_layout")
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=5, help="runs per scenario, the median is reported")
+    parser.add_argument("--output", default="bench_layout.json", help="path of the JSON results")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        persons = generate_roster(size, seed=size).persons
+        per_card = measure(layout_per_card, persons, args.repeat)
+        batch = measure(layout_batch, persons, args.repeat)
+        print(f"{size:6} cards: per card {per_card * 1000:8.2f} ms, batch {batch * 1000:8.2f} ms "
+              f"({per_card / batch:4.1f}x)", file=sys.stderr)
+        results.append({"size": size, "per_card_s": round(per_card, 5), "batch_s": round(batch, 5)})
+
+    write_report(args.output, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import argparse
+import multiprocessing
+import resource
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.PhotoServer import PhotoServer
+from benchmarks.report import write_report
+from benchmarks.roster import generate_roster
+
+DEFAULT_SIZES = [100, 1000, 5000]
+DEFAULT_MEMORY_LIMIT_MB = 16
+DEFAULT_TOLERANCE_MB = 64  # leaves room for the memo caches (QR matrices, text widths) filling up to 4096 persons
+
+
+def current_rss() -> int:
+    """
+    :return: resident set size of this process in bytes (Linux only)
+    """
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * resource.getpagesize()
+
+
+class PeakRss:
+    """
+    Samples the resident set size while the context is active. Unlike ru_maxrss, the peak is not raised by
+    allocations made (and freed) before, e.g. while generating the roster.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self.__sample, daemon=True)
+
+    def __enter__(self):
+        self.peak = current_rss()
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+    def __sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+
+def run_scenario(paper_size: str, size: int, image_base_url: str, photo_ratio: float, memory_limit: int) -> dict:
+    """
+    Renders one roster in a fresh process and reports how far the RSS peaked above its level before rendering. The
+    render stack is warmed up and the roster generated before, so only the memory of the render itself is measured.
+    :param memory_limit: memory limit of the bounded mode in bytes, 0 renders without it
+    """
+    from src.Helper.ImageCache import ImageCache
+    from src.Helper.Warmup import Warmup
+    from src.blocks import ImageBlock
+    from src.create_pdf import create_pdf
+
+    ImageBlock.image_cache = ImageCache(cache_dir=tempfile.mkdtemp(prefix="bench-image-cache-"))
+    Warmup.run()
+    data = generate_roster(size, photo_ratio=photo_ratio, image_base_url=image_base_url)
+
+    rss_before = current_rss()
+    start = time.perf_counter()
+    with PeakRss() as peak_rss, tempfile.TemporaryFile() as output:
+        create_pdf(data, paper_size, output, memory_limit=memory_limit or None)
+        output_bytes = output.tell()
+    wall_time = time.perf_counter() - start
+
+    return {"paper_size": paper_size,
+            "persons": size,
+            "memory_limit_mb": round(memory_limit / 1024 ** 2, 1) if memory_limit else None,
+            "wall_time_s": round(wall_time, 3),
+            "peak_rss_mb": round(peak_rss.peak / 1024 ** 2, 1),
+            "render_rss_increase_mb": round((peak_rss.peak - rss_before) / 1024 ** 2, 1),
+            "output_bytes": output_bytes}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Checks that the bounded-memory mode of create_pdf keeps peak memory "
+                                                 "flat as the roster grows. Exits with 1 if the render's peak RSS "
+                                                 "grows by more than the tolerance from the smallest to the largest "
+                                                 "roster. Run from the repository root: "
+                                                 "python -m benchmarks.bench_memory")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--paper-sizes", nargs="+", choices=["A4", "Label"], default=["A4", "Label"])
+    parser.add_argument("--memory-limit-mb", type=float, default=DEFAULT_MEMORY_LIMIT_MB)
+    parser.add_argument("--tolerance-mb", type=float, default=DEFAULT_TOLERANCE_MB)
+    parser.add_argument("--unbounded", action="store_true", help="also render without memory limit for comparison")
+    parser.add_argument("--photo-ratio", type=float, default=0.5)
+    parser.add_argument("--output", default="bench_memory.json", help="path of the JSON results")
+    args = parser.parse_args()
+
+    memory_limits = [int(args.memory_limit_mb * 1024 ** 2)] + ([0] if args.unbounded else [])
+    results = []
+    flat = True
+    context = multiprocessing.get_context("spawn")
+    with PhotoServer() as photo_server:
+        for paper_size in args.paper_sizes:
+            for memory_limit in memory_limits:
+                increases = []
+                for size in sorted(args.sizes):
+                    with context.Pool(1) as pool:
+                        result = pool.apply(run_scenario, (paper_size, size, photo_server.base_url, args.photo_ratio,
+                                                           memory_limit))
+                    print(f"{paper_size:>5} {'bounded' if memory_limit else 'unbounded':>9} {size:>5} persons: "
+                          f"{result['wall_time_s']:8.2f} s, {result['peak_rss_mb']:7.1f} MB peak, "
+                          f"+{result['render_rss_increase_mb']:6.1f} MB while rendering", file=sys.stderr)
+                    increases.append(result["render_rss_increase_mb"])
+                    results.append(result)
+
+                growth = increases[-1] - increases[0]
+                if memory_limit and growth > args.tolerance_mb:
+                    print(f"{paper_size}: peak memory grew by {growth:.1f} MB from {min(args.sizes)} to "
+                          f"{max(args.sizes)} persons (tolerance {args.tolerance_mb} MB)", file=sys.stderr)
+                    flat = False
+
+    write_report(args.output, results, photo_ratio=args.photo_ratio, tolerance_mb=args.tolerance_mb, flat=flat)
+    sys.exit(0 if flat else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import argparse
+import multiprocessing
+import resource
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from io import BytesIO
+
+from benchmarks.PhotoServer import PhotoServer
+from benchmarks.report import write_report
+from benchmarks.roster import generate_roster
+
+DEFAULT_SIZES = [10, 100, 1000]
+DEFAULT_MODES = ["A4", "Label", "preview"]
+STREAM_MODES = ["A4-stream", "Label-stream"]  # create_pdf_stream, to compare with rendering the document at once
+PREVIEW_SAMPLE_SIZE = 20  # previews are rendered per person, a sample is enough for the per-card cost
+
+
+def instrument_blocks(timings: dict[str, float]):
+    """
+    Wraps __post_init__ (image fetching, layout) and draw of every block to accumulate their durations.
+    """
+    from src.blocks import ImageBlock, MainBlock, QualificationsBlock, VehicleInstructionsBlock
+
+    for cls in (ImageBlock, MainBlock, VehicleInstructionsBlock, QualificationsBlock):
+        for method_name in ("__post_init__", "draw"):
+            if (original := cls.__dict__.get(method_name)) is None:
+                continue
+
+            def timed(self, *args, _original=original, _key=f"{cls.__name__}.{method_name.strip('_')}", **kwargs):
+                start = time.perf_counter()
+                try:
+                    return _original(self, *args, **kwargs)
+                finally:
+                    timings[_key] += time.perf_counter() - start
+
+            setattr(cls, method_name, timed)
+
+
+def run_scenario(mode: str, size: int, image_base_url: str, photo_ratio: float, seed: int) -> dict:
+    """
+    Runs one scenario in a fresh process, so peak memory and caches are not shared between scenarios.
+    """
+    from src.Helper.ImageCache import ImageCache
+    from src.blocks import ImageBlock
+    from src.create_pdf import create_pdf, create_pdf_stream
+    from src.create_preview import JpgRequest, create_preview
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    ImageBlock.image_cache = ImageCache(cache_dir=tempfile.mkdtemp(prefix="bench-image-cache-"))
+    timings = defaultdict(float)
+    instrument_blocks(timings)
+
+    data = generate_roster(size, photo_ratio=photo_ratio, seed=seed, image_base_url=image_base_url)
+    output = BytesIO()
+    start = time.perf_counter()
+    if mode == "preview":
+        persons = data.persons[:PREVIEW_SAMPLE_SIZE]
+        for person in persons:
+            create_preview(JpgRequest(title=data.title, person=person), output)
+        rendered = len(persons)
+    elif mode in STREAM_MODES:
+        for chunk in create_pdf_stream(data.persons, mode.split("-")[0]):
+            output.write(chunk)
+        rendered = size
+    else:
+        create_pdf(data, mode, output)
+        rendered = size
+    wall_time = time.perf_counter() - start
+
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {"mode": mode,
+            "persons": size,
+            "rendered": rendered,
+            "wall_time_s": round(wall_time, 4),
+            "wall_time_per_card_ms": round(wall_time / rendered * 1000, 3),
+            "peak_rss_mb": round(rss_after / 1024, 1),  # ru_maxrss is given in KiB on Linux
+            "peak_rss_increase_mb": round((rss_after - rss_before) / 1024, 1),
+            "output_bytes": output.tell(),
+            "block_timings_s": {key: round(value, 4) for key, value in sorted(timings.items())}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks create_pdf and create_preview on synthetic rosters. "
+                                                 "Run from the repository root: python -m benchmarks.bench_render")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--modes", nargs="+", choices=DEFAULT_MODES + STREAM_MODES,
+                        default=DEFAULT_MODES)
+    parser.add_argument("--photo-ratio", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_results.json", help="path of the JSON results")
+    args = parser.parse_args()
+
+    results = []
+    context = multiprocessing.get_context("spawn")
+    with PhotoServer() as photo_server:
+        for size in args.sizes:
+            for mode in args.modes:
+                with context.Pool(1) as pool:
+                    result = pool.apply(run_scenario, (mode, size, photo_server.base_url, args.photo_ratio, args.seed))
+                print(f"{mode:>12} {size:>5} persons: {result['wall_time_s']:8.3f} s, "
+                      f"{result['peak_rss_mb']:7.1f} MB peak, {result['output_bytes']:>10} bytes", file=sys.stderr)
+                results.append(result)
+
+    write_report(args.output, results, photo_ratio=args.photo_ratio, seed=args.seed)
+
+
+if __name__ == "__main__":
+    main()
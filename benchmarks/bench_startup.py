@@ -0,0 +1,101 @@
+import argparse
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+
+# nothing heavy is imported at module level: scenarios run in spawned processes, which import this module first
+DEFAULT_MODES = ["preview", "A4", "Label"]
+HEAVY_MODULES = ["reportlab", "PIL", "qrcode", "requests", "pypdf", "pdf2image"]
+
+
+def run_cold_start(mode: str, image_base_url: str, warmup: bool) -> dict:
+    """
+    Imports the handler in a fresh process and times the first and a second request. Response and card cache are
+    disabled, so both requests render.
+    """
+    os.environ["RENDER_RESPONSE_CACHE"] = "0"
+    os.environ["RENDER_CARD_CACHE"] = "0"
+    os.environ["RENDER_WARMUP"] = "0"
+
+    start = time.perf_counter()
+    from api.index import app
+    import_time = time.perf_counter() - start
+    loaded_on_import = [module for module in HEAVY_MODULES if module in sys.modules]
+
+    from fastapi.testclient import TestClient
+    from benchmarks.roster import generate_roster
+
+    client = TestClient(app)
+    warmup_time = None
+    if warmup:
+        start = time.perf_counter()
+        client.get("/api/warmup").raise_for_status()
+        warmup_time = time.perf_counter() - start
+
+    def request(seed: int) -> float:
+        data = generate_roster(10, seed=seed, image_base_url=image_base_url)
+        if mode == "preview":
+            url, body = "/api/generate-preview/", {"title": data.title, "person": data.persons[0].model_dump()}
+        else:
+            url, body = f"/api/generate-pdf/?paper_size={mode}", data.model_dump()
+        request_start = time.perf_counter()
+        client.post(url, json=body).raise_for_status()
+        return time.perf_counter() - request_start
+
+    first_request = request(seed=0)
+    second_request = request(seed=1)  # another roster, photos are not cached yet either
+    return {"mode": mode,
+            "warmup": warmup,
+            "import_s": round(import_time, 4),
+            "warmup_s": round(warmup_time, 4) if warmup_time is not None else None,
+            "first_request_s": round(first_request, 4),
+            "second_request_s": round(second_request, 4),
+            "heavy_modules_on_import": loaded_on_import}
+
+
+def summarize(runs: list[dict]) -> dict:
+    """
+    :return: median of the timings over all runs of a scenario
+    """
+    summary = {key: runs[0][key] for key in ("mode", "warmup", "heavy_modules_on_import")}
+    for key in ("import_s", "warmup_s", "first_request_s", "second_request_s"):
+        values = [run[key] for run in runs if run[key] is not None]
+        summary[key] = round(statistics.median(values), 4) if values else None
+    summary["runs"] = len(runs)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the cold start of the API handler: import time and "
+                                                 "latency of the first request, with and without warm-up. "
+                                                 "Run from the repository root: python -m benchmarks.bench_startup")
+    parser.add_argument("--modes", nargs="+", choices=DEFAULT_MODES, default=DEFAULT_MODES)
+    parser.add_argument("--repeat", type=int, default=3, help="cold starts per scenario, the median is reported")
+    parser.add_argument("--output", default="bench_startup.json", help="path of the JSON results")
+    args = parser.parse_args()
+
+    from benchmarks.PhotoServer import PhotoServer
+    from benchmarks.report import write_report
+
+    results = []
+    context = multiprocessing.get_context("spawn")  # fork would inherit the modules of this process
+    with PhotoServer() as photo_server:
+        for mode in args.modes:
+            for warmup in (False, True):
+                runs = []
+                for _ in range(args.repeat):
+                    with context.Pool(1) as pool:
+                        runs.append(pool.apply(run_cold_start, (mode, photo_server.base_url, warmup)))
+                result = summarize(runs)
+                print(f"{mode:>7} {'warm' if warmup else 'cold':>4}: import {result['import_s']:6.3f} s, "
+                      f"first request {result['first_request_s']:6.3f} s, "
+                      f"second request {result['second_request_s']:6.3f} s", file=sys.stderr)
+                results.append(result)
+
+    write_report(args.output, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+import json
+import platform
+import subprocess
+import time
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def write_report(path: str, results: list[dict], **meta):
+    """
+    Writes the results of a benchmark as JSON, together with the revision, time and platform they were measured on.
+    :param meta: further settings of the run, e.g. the photo ratio
+    """
+    report = {"meta": {"revision": git_revision(),
+                       "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                       "python": platform.python_version(),
+                       "platform": platform.platform(),
+                       **meta},
+              "results": results}
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
@@ -0,0 +1,46 @@
+import random
+from typing import Optional
+
+from src.FormatClasses import PdfRequest, Person
+from src.params import Params
+
+FIRST_NAMES = ["Anna", "Ben", "Clara", "David", "Emma", "Felix", "Greta", "Hannes", "Ida", "Jonas", "Lena", "Max"]
+LAST_NAMES = ["Müller", "Schmidt", "Schneider", "Fischer", "Weber", "Meyer", "Wagner", "Becker", "Schulz", "Hoffmann"]
+VEHICLES = ["HLF", "TLF", "DLK", "MTW", "RW", "ELW", "GW-L"]
+
+
+def generate_person(rng: random.Random, idx: int, photo_ratio: float, personnel_nr_ratio: float,
+                    image_base_url: Optional[str]) -> Person:
+    has_photo = image_base_url is not None and rng.random() < photo_ratio
+    has_personnel_nr = has_photo or rng.random() < personnel_nr_ratio  # photos are only shown with personnel nr
+
+    qualifications = rng.sample(Params.all_technical_qualifications, rng.randint(0, 4))
+    qualifications += Params.all_leading_qualifications[:rng.randint(0, len(Params.all_leading_qualifications))]
+    instructions = [{"vehicle": vehicle, "value": rng.random() < 0.5}
+                    for vehicle in rng.sample(VEHICLES, rng.randint(1, 4))]
+
+    return Person.from_json({
+        "first_name": rng.choice(FIRST_NAMES),
+        "last_name": rng.choice(LAST_NAMES),
+        "personnel_nr": str(10000 + idx) if has_personnel_nr else None,
+        "image_url": f"{image_base_url}/{idx}.jpg" if has_photo else None,
+        "function": rng.choice(Params.all_functions),
+        "qualifications": qualifications,
+        "instructions": instructions,
+    })
+
+
+def generate_roster(size: int, photo_ratio: float = 0.5, personnel_nr_ratio: float = 0.8, seed: int = 0,
+                    image_base_url: str = None) -> PdfRequest:
+    """
+    Generates a synthetic roster mixing persons with and without photo, personnel nr and varying instructions.
+    :param size: number of persons
+    :param photo_ratio: share of persons with a photo (only if image_base_url is given)
+    :param personnel_nr_ratio: share of persons without photo that have a personnel nr
+    :param seed: seed for reproducible rosters
+    :param image_base_url: base url serving '<idx>.jpg' photos, e.g. from PhotoServer
+    """
+    rng = random.Random(seed)
+    return PdfRequest(title=f"Synthetic roster ({size})",
+                      persons=[generate_person(rng, idx, photo_ratio, personnel_nr_ratio, image_base_url)
+                               for idx in range(size)])
@@ -0,0 +1,15 @@
+from pydantic import BaseModel
+
+from src.FormatClasses.Person import Person
+
+PREVIEW_DPI = 200
+PREVIEW_MEDIA_TYPES = {"PNG": "image/png", "JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+class JpgRequest(BaseModel):
+    title: str
+    person: Person
+
+
+class BulkPreviewRequest(BaseModel):
+    title: str
+    persons: list[Person]
@@ -0,0 +1,8 @@
+from pydantic import BaseModel
+
+from src.FormatClasses.Person import Person
+
+
+class PdfRequest(BaseModel):
+    title: str
+    persons: list[Person]
@@ -1,6 +1,4 @@
-from pydantic import BaseModel
-
-from src.params import Params
+from pydantic import BaseModel, Field
 
 
 class Instruction(BaseModel):
@@ -16,9 +14,12 @@ class Person(BaseModel):
     function: str | None
     qualifications: dict[str, bool]
     instructions: list[Instruction]
+    copies: int = Field(1, ge=1, le=100)  # cards printed of this person, e.g. spares for the vehicle and station
 
     @classmethod
     def from_json(cls, data: dict):
+        from src.params import Params  # imported lazily, it loads reportlab for its color maps
+
         qualifications_dict = {key: key in data["qualifications"] for key in
                                Params.all_technical_qualifications + Params.all_leading_qualifications}
         return cls(
@@ -29,5 +30,6 @@ class Person(BaseModel):
             function=data["function"],
             qualifications=qualifications_dict,
             instructions=[Instruction(**instr) for instr in data["instructions"]],
+            copies=data.get("copies") or 1,
 
         )
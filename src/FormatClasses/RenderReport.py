@@ -0,0 +1,14 @@
+from dataclasses import dataclass, field
+
+
+@dataclass
+class RenderReport:
+    """
+    Statistics collected while rendering a document, filled in by create_pdf.
+    """
+    # bytes of objects (fonts, icons, card chrome) repeated in the stitched parts of the document, e.g. worker chunks
+    # or page groups, that were written only once. 0 for a document drawn on one canvas or assembled from cached
+    # cards, which share them anyway
+    deduplicated_bytes: int = 0
+    cards_reused: int = 0  # cards taken from the card cache instead of being rendered (incremental mode)
+    placeholders: list[str] = field(default_factory=list)  # personnel_nr of persons whose photo could not be fetched
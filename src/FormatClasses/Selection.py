@@ -0,0 +1,52 @@
+from dataclasses import dataclass, field
+from typing import Optional, Sequence
+
+from src.FormatClasses.Person import Person
+
+
+@dataclass
+class Selection:
+    """
+    Subset of a roster to render, e.g. to reprint single worn-out cards. A person is selected if it matches any of
+    the given criteria, the selected persons keep their roster order.
+    """
+    indices: list[int] = field(default_factory=list)  # positions in the roster, starting at 0
+    personnel_nrs: list[str] = field(default_factory=list)
+    pages: Optional[tuple[int, int]] = None  # first and last page (starting at 1, inclusive) of the whole document
+
+    @classmethod
+    def parse_pages(cls, pages: str) -> tuple[int, int]:
+        """
+        :param pages: single page ('3') or page range ('3-5')
+        :return: first and last page
+        """
+        first, _, last = pages.partition("-")
+        try:
+            first, last = int(first), int(last or first)
+        except ValueError:
+            raise ValueError(f"Invalid page range '{pages}', expected e.g. '3' or '3-5'")
+        if not 1 <= first <= last:
+            raise ValueError(f"Invalid page range '{pages}', pages start at 1 and the range must not be reversed")
+        return first, last
+
+    def select(self, persons: list[Person], pages: Sequence[tuple[int, int]]) -> list[Person]:
+        """
+        :param pages: first and last page (starting at 0) of the cards of every person in the document of the whole
+                      roster, they differ for persons printed in several copies
+        :raises ValueError: if an index or personnel_nr is not part of the roster or nothing is selected
+        """
+        if invalid := [idx for idx in self.indices if not 0 <= idx < len(persons)]:
+            raise ValueError(f"Indices {invalid} are out of range for a roster of {len(persons)} persons")
+        if unknown := set(self.personnel_nrs) - {person.personnel_nr for person in persons}:
+            raise ValueError(f"Personnel numbers {sorted(unknown)} are not part of the roster")
+
+        indices = set(self.indices)
+        personnel_nrs = set(self.personnel_nrs)
+        selected = [person for idx, (person, (first, last)) in enumerate(zip(persons, pages))
+                    if idx in indices or person.personnel_nr in personnel_nrs
+                    or (self.pages is not None and self.pages[0] <= last + 1 and first + 1 <= self.pages[1])]
+        if not selected:
+            page_count = pages[-1][1] + 1 if pages else 0
+            raise ValueError(f"Selection matches no person, the document has {page_count} pages" if self.pages
+                             else "Selection matches no person")
+        return selected
@@ -0,0 +1,27 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class SpriteIndex:
+    """
+    Position of the cards within a sprite sheet. Cards are placed in request order from left to right and top to
+    bottom in a grid of equally sized tiles.
+    """
+    count: int = 0
+    columns: int = 0
+    tile_width: int = 0  # pxl
+    tile_height: int = 0  # pxl
+
+    def offset(self, idx: int) -> tuple[int, int]:
+        """
+        :return: top left corner (in pxl) of the card with the given index
+        """
+        if not 0 <= idx < self.count:
+            raise IndexError(f"Index out of range. Max. index is {self.count - 1} for given sprite sheet.")
+        return (idx % self.columns) * self.tile_width, (idx // self.columns) * self.tile_height
+
+    def offsets(self) -> list[tuple[int, int, int, int]]:
+        """
+        :return: x, y, width and height of every card
+        """
+        return [(*self.offset(idx), self.tile_width, self.tile_height) for idx in range(self.count)]
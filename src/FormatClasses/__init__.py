@@ -1,2 +1,7 @@
 from .Dimensions import Dimensions
 from .Person import Person
+from .PdfRequest import PdfRequest
+from .JpgRequest import BulkPreviewRequest, JpgRequest
+from .RenderReport import RenderReport
+from .Selection import Selection
+from .SpriteIndex import SpriteIndex
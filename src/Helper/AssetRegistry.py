@@ -0,0 +1,83 @@
+import hashlib
+import os
+from dataclasses import dataclass
+
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+from src.Helper.ImageNormalizer import ImageNormalizer
+from src.Helper.StateCanvas import StateCanvas
+
+
+@dataclass
+class Asset:
+    form_name: str
+    size: (int, int)  # pxl dimensions of the image
+
+
+class AssetRegistry:
+    """
+    Registers static images (icons, placeholder) once per canvas as a form XObject of size 1x1, so that every
+    card references the same embedded image object instead of drawing the image file again.
+    Decoded images are shared between all canvases of the process and normalized to the size they are first drawn at.
+    """
+    _readers: dict[str, ImageReader] = {}
+
+    def __init__(self, c: canvas):
+        self.c = c
+        self.assets: dict[str, Asset] = {}
+
+    @classmethod
+    def for_canvas(cls, c: canvas) -> "AssetRegistry":
+        c = StateCanvas.wrap(c)  # draw through the same wrapper as the cards, so its tracked state stays valid
+        if (registry := vars(c).get("asset_registry")) is None:  # kept on the canvas, so it lives as long as the canvas
+            registry = c.asset_registry = cls(c)
+        return registry
+
+    @classmethod
+    def get_reader(cls, path: str) -> ImageReader:
+        """
+        :return: decoded image for the given path, loaded only once per process
+        """
+        path = os.path.abspath(path)
+        if (reader := cls._readers.get(path)) is None:
+            if not os.path.exists(path):
+                raise ValueError(f"Image '{path}' not found")
+            reader = cls._readers[path] = ImageReader(path)
+        return reader
+
+    def draw(self, path: str, x, y, width, height, preserve_aspect_ratio=False):
+        """
+        Draws the registered image within the given box, behaves like canvas.drawImage(..., mask="auto").
+        """
+        path = os.path.abspath(path)
+        asset = self.__register(path, width, height, preserve_aspect_ratio)
+
+        if preserve_aspect_ratio:  # center image within box
+            img_width, img_height = asset.size
+            scale = min(width / img_width, height / img_height)
+            x += (width - img_width * scale) / 2
+            y += (height - img_height * scale) / 2
+            width, height = img_width * scale, img_height * scale
+
+        self.c.saveState()
+        self.c.translate(x, y)
+        self.c.scale(width, height)
+        self.c.doForm(asset.form_name)
+        self.c.restoreState()
+
+    def __register(self, path: str, width, height, preserve_aspect_ratio) -> Asset:
+        if (asset := self.assets.get(path)) is not None:
+            return asset
+
+        reader = self.get_reader(path)
+        normalized = ImageNormalizer.normalize(reader, width, height, fit=preserve_aspect_ratio)
+        form_name = "Asset" + hashlib.md5(path.encode("utf-8")).hexdigest()[:12]
+
+        self.c.beginForm(form_name, 0, 0, 1, 1)
+        self.c.drawImage(normalized, 0, 0, width=1, height=1, mask="auto")
+        self.c.endForm()
+
+        asset = self.assets[path] = Asset(form_name, reader.getSize())
+        return asset
+
@@ -36,5 +36,4 @@ class BlockHelper:
 
         prev_block = block_list[curr_i - 1]
         prev_block.width = curr_block.x_pos - prev_block.x_pos
-        print(f"Block updated: '{list(blocks.keys())[curr_i - 1]}'")
         BlockHelper.update_prev_block(blocks, curr_i - 1)  # update blocks recursively if prev block has an x-value
@@ -27,6 +27,47 @@ class CanvasHelper:
 
     @staticmethod
     def draw_rotated_image(c: canvas, image, x, y, angle, side_length, scale=1, padding=0):
+        CanvasHelper.__begin_rotated_frame(c, x, y, angle, side_length, scale, padding)
+        c.drawImage(image,
+                    -side_length / 2,
+                    -side_length / 2,
+                    width=side_length,
+                    height=side_length)
+        c.restoreState()
+
+    @staticmethod
+    def draw_rotated_matrix(c: canvas, matrix: tuple[tuple[bool, ...], ...], x, y, angle, side_length, scale=1,
+                            padding=0, color=colors.black):
+        """
+        Draws a square boolean matrix (e.g. the modules of a QR code) as one vector path instead of an image.
+        Horizontally adjacent modules are merged into one rectangle.
+        :param matrix: rows from top to bottom, True for filled modules
+        """
+        CanvasHelper.__begin_rotated_frame(c, x, y, angle, side_length, scale, padding)
+
+        module_size = side_length / len(matrix)
+        path = c.beginPath()
+        for row_idx, row in enumerate(matrix):
+            row_y = side_length / 2 - (row_idx + 1) * module_size
+            col = 0
+            while col < len(row):
+                if not row[col]:
+                    col += 1
+                    continue
+                start = col
+                while col < len(row) and row[col]:
+                    col += 1
+                path.rect(-side_length / 2 + start * module_size, row_y, (col - start) * module_size, module_size)
+
+        c.setFillColor(color)
+        c.drawPath(path, stroke=0, fill=1)
+        c.restoreState()
+
+    @staticmethod
+    def __begin_rotated_frame(c: canvas, x, y, angle, side_length, scale, padding):
+        """
+        Saves the state and moves the origin to the center of the rotated square. Must be closed with restoreState.
+        """
         c.saveState()
         c.translate(x, y)
         c.rotate(angle)
@@ -37,10 +78,3 @@ class CanvasHelper:
             c.rect(-side_length / 2 - padding, -side_length / 2 - padding,
                    side_length + 2 * padding,
                    side_length + 2 * padding, fill=1)
-
-        c.drawImage(image,
-                    -side_length / 2,
-                    -side_length / 2,
-                    width=side_length,
-                    height=side_length)
-        c.restoreState()
@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from src.FormatClasses import Person
+
+
+class CardCache:
+    """
+    Two-tier cache of rendered cards, each stored as fragment prepared for assembly (see FormFragment.to_bytes):
+        - in-process LRU of the fragment bytes
+        - on-disk store of the fragments, named by their key
+    The key is a stable hash of the person and the layout parameters, so a card is only rendered again if the
+    person's data or the layout changed. Fragments older than max_age are rendered again, e.g. to pick up a new photo
+    behind the same url.
+    """
+    version = 4  # part of every key, increase whenever the drawing of a card changes
+
+    def __init__(self, cache_dir: str = None, max_disk_bytes: int = 256 * 1024 ** 2, max_memory_items: int = 512,
+                 max_age: float = 24 * 3600):
+        """
+        :param cache_dir: directory of the disk tier, defaults to a folder in the system temp dir
+        :param max_disk_bytes: oldest fragments are evicted once the disk tier exceeds this size
+        :param max_memory_items: number of fragments kept in memory
+        :param max_age: seconds a fragment is reused
+        """
+        self.cache_dir = cache_dir or os.path.join(tempfile.gettempdir(), "mock-nametags", "cards")
+        self.max_disk_bytes = max_disk_bytes
+        self.max_memory_items = max_memory_items
+        self.max_age = max_age
+
+        self._memory: OrderedDict[str, tuple[bytes, float]] = OrderedDict()  # key -> (fragment, stored at)
+        self._disk: Optional[OrderedDict[str, int]] = None  # file name -> size, oldest first, scanned on first store
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def key(cls, person: Person, **layout) -> str:
+        """
+        :param layout: parameters the card is drawn with, e.g. card size, padding and font
+        :return: stable hash of the person and the layout
+        """
+        person_data = person.model_dump(mode="json", exclude={"copies"})  # copies place the same card again
+        payload = json.dumps({"version": cls.version, "person": person_data, "layout": layout}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        :return: fragment of the card if it was stored within max_age, else None
+        """
+        with self._lock:
+            if (entry := self._memory.get(key)) is not None:
+                fragment, stored_at = entry
+                if self.__is_fresh(stored_at):
+                    self._memory.move_to_end(key)
+                    return fragment
+                del self._memory[key]
+
+        path = self.__path(key)
+        try:
+            stored_at = os.stat(path).st_mtime
+            if not self.__is_fresh(stored_at):
+                return None
+            with open(path, "rb") as f:
+                fragment = f.read()
+        except OSError:
+            return None  # missing or evicted -> treat as miss
+
+        self.__remember(key, fragment, stored_at)
+        return fragment
+
+    def store(self, key: str, fragment: bytes):
+        self.__remember(key, fragment, time.time())
+        self.__write_atomic(self.__path(key), fragment)
+        self.__evict_disk(os.path.basename(self.__path(key)), len(fragment))
+
+    def clear_memory(self):
+        with self._lock:
+            self._memory.clear()
+
+    def __is_fresh(self, stored_at: float) -> bool:
+        return time.time() - stored_at < self.max_age
+
+    def __remember(self, key: str, fragment: bytes, stored_at: float):
+        with self._lock:
+            self._memory[key] = (fragment, stored_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_items:
+                self._memory.popitem(last=False)
+
+    def __evict_disk(self, stored_name: str, stored_size: int):
+        """
+        Accounts for the stored fragment and removes the oldest ones while the disk tier exceeds max_disk_bytes. The
+        directory is only listed once, afterwards its size is tracked by the stores of this instance.
+        """
+        with self._lock:
+            if self._disk is None:
+                self.__scan_disk()
+            self._disk_bytes += stored_size - self._disk.pop(stored_name, 0)
+            self._disk[stored_name] = stored_size
+
+            while self._disk_bytes > self.max_disk_bytes and self._disk:
+                name, size = self._disk.popitem(last=False)
+                self._disk_bytes -= size
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    continue  # removed by another process
+
+    def __scan_disk(self):
+        fragments = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".fragment"):
+                try:
+                    stat = os.stat(os.path.join(self.cache_dir, name))
+                except OSError:
+                    continue
+                fragments.append((stat.st_mtime, stat.st_size, name))
+        self._disk = OrderedDict((name, size) for _, size, name in sorted(fragments))
+        self._disk_bytes = sum(self._disk.values())
+
+    def __write_atomic(self, path: str, content: bytes):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    def __path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + ".fragment")
@@ -0,0 +1,25 @@
+class ChunkBuffer:
+    """
+    Write-only binary stream whose content is taken out in chunks (see drain), e.g. to stream a document while it
+    is written. tell() keeps counting all bytes ever written, so writers computing offsets from it (like
+    PdfStitcher) are not affected by draining.
+    """
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._written = 0
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        self._written += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._written
+
+    def drain(self) -> bytes:
+        """
+        :return: everything written since the last drain
+        """
+        chunk, self._chunks = b"".join(self._chunks), []
+        return chunk
@@ -0,0 +1,62 @@
+import threading
+import time
+from dataclasses import dataclass
+
+
+class HostUnavailable(Exception):
+    pass
+
+
+@dataclass
+class _HostState:
+    failures: int = 0  # consecutive failures
+    opened_at: float = None  # set while the circuit is open
+    probing: bool = False  # a single request is let through to test whether the host recovered
+
+
+class CircuitBreaker:
+    """
+    Per-host circuit breaker: after failure_threshold consecutive failures a host is not requested for reset_timeout
+    seconds. Afterwards a single probe request is let through, which closes the circuit on success and opens it
+    again on failure.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30):
+        """
+        :param failure_threshold: consecutive failures (timeouts, connection errors, server errors) opening the circuit
+        :param reset_timeout: seconds a host is skipped once its circuit opened
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self._hosts: dict[str, _HostState] = {}
+        self._lock = threading.Lock()
+
+    def check(self, host: str):
+        """
+        :raises HostUnavailable: if the circuit of the host is open
+        """
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None or state.opened_at is None:
+                return
+            if state.probing or time.monotonic() - state.opened_at < self.reset_timeout:
+                raise HostUnavailable(f"Circuit of host '{host}' is open after {state.failures} failures")
+            state.probing = True
+
+    def record_success(self, host: str):
+        with self._lock:
+            self._hosts.pop(host, None)
+
+    def record_failure(self, host: str):
+        with self._lock:
+            state = self._hosts.setdefault(host, _HostState())
+            state.failures += 1
+            if state.probing or state.failures >= self.failure_threshold:
+                state.opened_at = time.monotonic()
+                state.probing = False
+
+    def is_open(self, host: str) -> bool:
+        with self._lock:
+            state = self._hosts.get(host)
+            return state is not None and state.opened_at is not None
@@ -0,0 +1,153 @@
+import base64
+import hashlib
+import json
+from dataclasses import dataclass
+from io import BytesIO
+from typing import BinaryIO, Union
+
+from pypdf import PdfReader
+from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, NameObject, PdfObject, StreamObject
+
+# serialized PDF text with references to other objects (index into FormFragment.objects) in between
+Template = list[Union[str, int]]
+
+
+@dataclass
+class FormFragment:
+    """
+    Page of a PDF document prepared to be placed as form XObject (see PdfStitcher.add_form) without parsing the
+    document again: its content stream and the objects it references, already serialized in dependency order
+    (referenced objects first). Every object carries a digest of its content including the objects it references, so
+    objects shared by several fragments (fonts, icons, card chrome) are recognized and embedded only once.
+    """
+    bbox: tuple[float, float, float, float]
+    content: bytes  # encoded content stream
+    content_entries: str  # entries of the content stream's dictionary besides /Length, e.g. its /Filter
+    resources: Template
+    objects: list[tuple[str, Template, bytes]]  # digest, dictionary or array and stream data (None if no stream)
+
+    @classmethod
+    def split(cls, document: Union[bytes, BinaryIO]) -> list["FormFragment"]:
+        """
+        :param document: content or stream of a PDF document
+        :return: fragment of every page of the document, each holding all objects it references
+        """
+        reader = PdfReader(BytesIO(document) if isinstance(document, bytes) else document)
+        serialized: dict[int, tuple[str, Template, bytes]] = {}  # object number -> object, refs by object number
+        fragments = []
+        for page in reader.pages:
+            contents = page.raw_get("/Contents").get_object() if "/Contents" in page else None
+            if isinstance(contents, StreamObject) and contents.get("/Filter") == ["/ASCII85Decode", "/FlateDecode"]:
+                # as reportlab writes it, the ASCII85 layer only makes the binary stream a quarter larger
+                content, content_entries = base64.a85decode(contents._data, adobe=True), "/Filter /FlateDecode"
+            elif isinstance(contents, StreamObject):  # kept encoded
+                content, content_entries = contents._data, cls.__serialize_entries(contents, skip={"/Length"})
+            elif contents is not None:  # several content streams are merged
+                content, content_entries = page.get_contents().flate_encode()._data, "/Filter /FlateDecode"
+            else:
+                content, content_entries = b"", ""
+
+            resources = cls.__serialize(page["/Resources"], reader, serialized) if "/Resources" in page else ["<< >>"]
+            # objects referenced by the page, by object number in the document
+            numbers: dict[int, None] = {}
+            cls.__collect(resources, serialized, numbers)
+            index = {number: idx for idx, number in enumerate(numbers)}
+            objects = [(serialized[number][0], cls.__renumber(serialized[number][1], index), serialized[number][2])
+                       for number in numbers]
+            fragments.append(cls(tuple(float(value) for value in page.mediabox), content, content_entries,
+                                 cls.__renumber(resources, index), objects))
+        return fragments
+
+    def to_bytes(self) -> bytes:
+        """
+        :return: header line (JSON) followed by the content stream and the data of all streams
+        """
+        header = {"bbox": self.bbox, "content_entries": self.content_entries, "resources": self.resources,
+                  "content_length": len(self.content),
+                  "objects": [(digest, template, len(data) if data is not None else None)
+                              for digest, template, data in self.objects]}
+        return b"".join([json.dumps(header).encode("utf-8"), b"\n", self.content,
+                         *(data for _, _, data in self.objects if data is not None)])
+
+    @classmethod
+    def from_bytes(cls, content: bytes) -> "FormFragment":
+        """
+        :raises ValueError: if the content is no serialized fragment
+        """
+        header_end = content.index(b"\n")
+        header = json.loads(content[:header_end])
+        offset = header_end + 1 + header["content_length"]
+        objects = []
+        for digest, template, length in header["objects"]:
+            data = None
+            if length is not None:
+                data, offset = content[offset:offset + length], offset + length
+            objects.append((digest, template, data))
+        return cls(tuple(header["bbox"]), content[header_end + 1:header_end + 1 + header["content_length"]],
+                   header["content_entries"], header["resources"], objects)
+
+    @classmethod
+    def __serialize(cls, obj: PdfObject, reader: PdfReader, serialized: dict) -> Template:
+        """
+        Serializes a direct object, the indirect objects it references are serialized into serialized once.
+        :return: template with the references given by object number
+        """
+        if isinstance(obj, IndirectObject):
+            if obj.idnum not in serialized:
+                serialized[obj.idnum] = None  # being serialized
+                serialized[obj.idnum] = cls.__serialize_object(obj.get_object(), reader, serialized)
+            elif serialized[obj.idnum] is None:
+                raise ValueError(f"Object {obj.idnum} references itself, reference cycles are not supported")
+            return [obj.idnum]
+        if isinstance(obj, DictionaryObject):
+            template = ["<<"]
+            for key, value in obj.items():
+                template += [f" {cls.__text(NameObject(key))} "] + cls.__serialize(value, reader, serialized)
+            return template + [" >>"]
+        if isinstance(obj, ArrayObject):
+            template = ["["]
+            for value in obj:
+                template += [" "] + cls.__serialize(value, reader, serialized)
+            return template + [" ]"]
+        return [cls.__text(obj)]
+
+    @classmethod
+    def __serialize_object(cls, obj: PdfObject, reader: PdfReader, serialized: dict) -> tuple[str, Template, bytes]:
+        data = None
+        if isinstance(obj, StreamObject):
+            data = obj._data
+            template = cls.__serialize(DictionaryObject({key: value for key, value in obj.items() if key != "/Length"}),
+                                       reader, serialized)
+            template = template[:-1] + [f" /Length {len(data)} >>"]
+        else:
+            template = cls.__serialize(obj, reader, serialized)
+        digest = hashlib.sha256()
+        for part in template:  # referenced objects by their digest, they are serialized before
+            digest.update(part.encode("latin-1") if isinstance(part, str) else serialized[part][0].encode("ascii"))
+        digest.update(data if data is not None else b"")
+        return digest.hexdigest(), template, data
+
+    @classmethod
+    def __serialize_entries(cls, obj: DictionaryObject, skip: set[str]) -> str:
+        return "".join(f" {cls.__text(NameObject(key))} {cls.__text(value)}"
+                       for key, value in obj.items() if key not in skip)
+
+    @staticmethod
+    def __text(obj: PdfObject) -> str:
+        buffer = BytesIO()
+        obj.write_to_stream(buffer)
+        return buffer.getvalue().decode("latin-1")
+
+    @classmethod
+    def __collect(cls, template: Template, serialized: dict, numbers: dict[int, None]):
+        """
+        Adds the objects referenced by the template to numbers (ordered), referenced objects first.
+        """
+        for part in template:
+            if isinstance(part, int) and part not in numbers:
+                cls.__collect(serialized[part][1], serialized, numbers)
+                numbers[part] = None
+
+    @staticmethod
+    def __renumber(template: Template, index: dict[int, int]) -> Template:
+        return [index[part] if isinstance(part, int) else part for part in template]
@@ -0,0 +1,46 @@
+import hashlib
+from typing import Callable, Hashable
+
+from reportlab.pdfgen import canvas
+
+from src.Helper.StateCanvas import StateCanvas
+
+
+class FormRegistry:
+    """
+    Draws static content that is identical on many cards (borders, empty squares, grey bars, ...) only once per
+    canvas as form XObject, every card just places the form. Forms are identified by a key describing everything
+    their content depends on, e.g. the block class and its size.
+    """
+    bbox_margin = 2  # the bounding box exceeds the content, so lines on its edges are not clipped
+
+    def __init__(self, c: canvas):
+        self.c = c
+        self.forms: dict[Hashable, str] = {}  # key -> form name
+
+    @classmethod
+    def for_canvas(cls, c: canvas) -> "FormRegistry":
+        c = StateCanvas.wrap(c)  # draw through the same wrapper as the cards, so its tracked state stays valid
+        if (registry := vars(c).get("form_registry")) is None:  # kept on the canvas, so it lives as long as the canvas
+            registry = c.form_registry = cls(c)
+        return registry
+
+    def draw(self, key: Hashable, x, y, width, height, draw_content: Callable[[], None]):
+        """
+        Places the form of the given key with its origin at (x, y). On first use of the key, the form is recorded by
+        calling draw_content, which draws the content at its position on the canvas (shifted to the form's origin).
+        :param width: width of the content (in pt)
+        :param height: height of the content (in pt)
+        """
+        if (form_name := self.forms.get(key)) is None:
+            form_name = self.forms[key] = "Chrome" + hashlib.md5(repr(key).encode("utf-8")).hexdigest()[:12]
+            self.c.beginForm(form_name, -self.bbox_margin, -self.bbox_margin,
+                             width + self.bbox_margin, height + self.bbox_margin)
+            self.c.translate(-x, -y)
+            draw_content()
+            self.c.endForm()
+
+        self.c.saveState()
+        self.c.translate(x, y)
+        self.c.doForm(form_name)
+        self.c.restoreState()
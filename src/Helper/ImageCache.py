@@ -0,0 +1,232 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from io import BytesIO
+from typing import Optional
+
+from reportlab.lib.utils import ImageReader
+
+
+@dataclass
+class CachedImage:
+    url: str
+    digest: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    checked_at: float = field(default_factory=time.time)
+    reader: Optional[ImageReader] = None
+
+    def validators(self) -> dict[str, str]:
+        """
+        :return: headers for a conditional request revalidating this entry
+        """
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ImageCache:
+    """
+    Two-tier cache for downloaded photos:
+        - in-process LRU of decoded ImageReader objects (skips network and decode)
+        - on-disk store of the raw content, addressed by its sha256 and indexed by url plus ETag/Last-Modified. Least
+          recently used content is evicted together with the index files pointing to it
+    Entries younger than max_age are used without any request, older ones have to be revalidated by the caller.
+    """
+
+    def __init__(self, cache_dir: str = None, max_disk_bytes: int = 256 * 1024 ** 2, max_memory_items: int = 64,
+                 max_age: float = 3600):
+        """
+        :param cache_dir: directory of the disk tier, defaults to a folder in the system temp dir
+        :param max_disk_bytes: least recently used content is evicted once the disk tier exceeds this size
+        :param max_memory_items: number of decoded images kept in memory
+        :param max_age: seconds an entry is considered fresh without revalidation
+        """
+        self.cache_dir = cache_dir or os.path.join(tempfile.gettempdir(), "mock-nametags", "images")
+        self.max_disk_bytes = max_disk_bytes
+        self.max_memory_items = max_memory_items
+        self.max_age = max_age
+
+        self._memory: OrderedDict[str, CachedImage] = OrderedDict()
+        # disk tier, the directory is scanned on first store and tracked by this instance afterwards
+        self._blobs: Optional[OrderedDict[str, int]] = None  # digest -> size of the content, least recently used first
+        self._indexes: dict[str, tuple[str, int]] = {}  # index file name -> digest it points to and its size
+        self._blob_indexes: dict[str, set[str]] = {}  # digest -> names of the index files pointing to it
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, url: str) -> Optional[ImageReader]:
+        """
+        :return: decoded image from the memory tier, regardless of its freshness
+        """
+        with self._lock:
+            entry = self._memory.get(url)
+            if entry is None:
+                return None
+            self._memory.move_to_end(url)
+            return entry.reader
+
+    def lookup(self, url: str) -> Optional[CachedImage]:
+        """
+        Looks up the memory tier first and loads the entry from disk into memory on a miss.
+        """
+        with self._lock:
+            if (entry := self._memory.get(url)) is not None:
+                self._memory.move_to_end(url)
+                return entry
+
+        entry = self.__load_from_disk(url)
+        if entry is not None:
+            self.__remember(entry)
+        return entry
+
+    def is_fresh(self, entry: CachedImage) -> bool:
+        return time.time() - entry.checked_at < self.max_age
+
+    def store(self, url: str, content: bytes, etag: str = None, last_modified: str = None) -> CachedImage:
+        digest = hashlib.sha256(content).hexdigest()
+        entry = CachedImage(url, digest, etag, last_modified,
+                            reader=ImageReader(BytesIO(content)))
+
+        blob_path = self.__blob_path(digest)
+        if not os.path.exists(blob_path):
+            self.__write_atomic(blob_path, content)
+        index_size = self.__write_index(entry)
+        self.__remember(entry)
+        self.__evict_disk(digest, len(content), os.path.basename(self.__index_path(url)), index_size)
+        return entry
+
+    def revalidated(self, entry: CachedImage) -> CachedImage:
+        """
+        Marks an entry as fresh again, e.g. after the server answered '304 Not Modified'.
+        """
+        entry.checked_at = time.time()
+        index_size = self.__write_index(entry)
+        blob_path = self.__blob_path(entry.digest)
+        if os.path.exists(blob_path):
+            os.utime(blob_path)  # keep recently used content away from eviction
+            self.__evict_disk(entry.digest, os.path.getsize(blob_path), os.path.basename(self.__index_path(entry.url)),
+                              index_size)
+        return entry
+
+    def clear_memory(self):
+        with self._lock:
+            self._memory.clear()
+
+    def __remember(self, entry: CachedImage):
+        with self._lock:
+            self._memory[entry.url] = entry
+            self._memory.move_to_end(entry.url)
+            while len(self._memory) > self.max_memory_items:
+                self._memory.popitem(last=False)
+
+    def __load_from_disk(self, url: str) -> Optional[CachedImage]:
+        try:
+            with open(self.__index_path(url), "r") as f:
+                meta = json.load(f)
+            blob_path = self.__blob_path(meta["digest"])
+            with open(blob_path, "rb") as f:
+                content = f.read()
+        except (OSError, ValueError, KeyError):
+            return None  # missing, evicted or corrupt -> treat as miss
+
+        os.utime(blob_path)
+        with self._lock:
+            if self._blobs is not None and meta["digest"] in self._blobs:
+                self._blobs.move_to_end(meta["digest"])
+        return CachedImage(url, meta["digest"], meta.get("etag"), meta.get("last_modified"),
+                           meta.get("checked_at", 0), ImageReader(BytesIO(content)))
+
+    def __write_index(self, entry: CachedImage) -> int:
+        """
+        :return: size of the written index file
+        """
+        meta = {"url": entry.url,
+                "digest": entry.digest,
+                "etag": entry.etag,
+                "last_modified": entry.last_modified,
+                "checked_at": entry.checked_at}
+        content = json.dumps(meta).encode("utf-8")
+        self.__write_atomic(self.__index_path(entry.url), content)
+        return len(content)
+
+    def __evict_disk(self, digest: str, size: int, index_name: str, index_size: int):
+        """
+        Accounts for the stored content and its index file and removes the least recently used content, together
+        with the index files pointing to it, while the disk tier exceeds max_disk_bytes. The directory is only listed
+        once, afterwards its size is tracked by the stores of this instance.
+        """
+        with self._lock:
+            if self._blobs is None:
+                self.__scan_disk()
+            self._disk_bytes += size - self._blobs.pop(digest, 0)
+            self._blobs[digest] = size
+            self.__track_index(index_name, digest, index_size)
+
+            while self._disk_bytes > self.max_disk_bytes and self._blobs:
+                evicted, evicted_size = self._blobs.popitem(last=False)
+                self._disk_bytes -= evicted_size
+                self.__remove(evicted + ".bin")
+                for name in self._blob_indexes.pop(evicted, ()):
+                    self._disk_bytes -= self._indexes.pop(name)[1]
+                    self.__remove(name)
+
+    def __scan_disk(self):
+        blobs, indexes = [], {}
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            try:
+                if name.endswith(".bin"):
+                    stat = os.stat(path)
+                    blobs.append((stat.st_mtime, stat.st_size, name[:-len(".bin")]))
+                elif name.endswith(".json"):
+                    with open(path, "rb") as f:
+                        content = f.read()
+                    indexes[name] = (json.loads(content)["digest"], len(content))
+            except OSError:
+                continue
+            except (ValueError, KeyError):
+                self.__remove(name)  # corrupt index
+
+        self._blobs = OrderedDict((digest, size) for _, size, digest in sorted(blobs))
+        self._disk_bytes = sum(self._blobs.values())
+        for name, (digest, size) in indexes.items():
+            if digest in self._blobs:
+                self.__track_index(name, digest, size)
+            else:  # its content was evicted before
+                self.__remove(name)
+
+    def __track_index(self, name: str, digest: str, size: int):
+        if (previous := self._indexes.get(name)) is not None:  # the url pointed to other content before
+            self._disk_bytes -= previous[1]
+            self._blob_indexes[previous[0]].discard(name)
+        self._indexes[name] = (digest, size)
+        self._blob_indexes.setdefault(digest, set()).add(name)
+        self._disk_bytes += size
+
+    def __remove(self, name: str):
+        try:
+            os.remove(os.path.join(self.cache_dir, name))
+        except OSError:
+            pass  # removed by another process
+
+    def __write_atomic(self, path: str, content: bytes):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    def __index_path(self, url: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json")
+
+    def __blob_path(self, digest: str) -> str:
+        return os.path.join(self.cache_dir, digest + ".bin")
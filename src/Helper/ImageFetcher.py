@@ -0,0 +1,196 @@
+import contextvars
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed, wait
+from io import BytesIO
+from typing import Iterable, Optional
+from urllib.parse import urlsplit
+
+import requests
+from reportlab.lib.utils import ImageReader
+from requests.adapters import HTTPAdapter
+
+from src.Helper.CircuitBreaker import CircuitBreaker, HostUnavailable
+from src.Helper.ImageCache import ImageCache
+from src.Helper.Metrics import Metrics
+
+FETCH_TIMEOUT = 5  # seconds per request to connect and between received bytes
+HEDGE_AFTER = 1.5  # seconds after which a second request is sent for a photo that has not arrived yet
+FETCH_DEADLINE = 10  # seconds all prefetches of a fetcher may take, photos missing by then are drawn as placeholder
+
+
+class ImageFetcher:
+    """
+    Downloads the photos of a whole roster concurrently over one pooled HTTP session before any card is drawn.
+    A photo that cannot be fetched does not fail the render, its card gets the placeholder instead:
+        - every request times out, a slow one is hedged by a second request after hedge_after seconds
+        - hosts failing repeatedly are skipped for a while (see CircuitBreaker)
+        - the prefetches of a fetcher share one deadline, e.g. the batches of a render. Photos still missing when it
+          passes are given up, later prefetches only use the cache
+    If a download fails, a stale cached photo is used rather than the placeholder.
+    """
+    circuit_breaker = CircuitBreaker()  # shared by all fetchers, so a failing host is skipped by later renders as well
+
+    def __init__(self, max_workers: int = 8, cache: ImageCache = None, timeout: float = FETCH_TIMEOUT,
+                 hedge_after: Optional[float] = HEDGE_AFTER, deadline: Optional[float] = FETCH_DEADLINE):
+        """
+        :param max_workers: maximum number of concurrent downloads (and pooled connections per host)
+        :param cache: optional cache, fresh entries are used without a request and stale ones are revalidated
+        :param timeout: seconds per request to connect and between received bytes
+        :param hedge_after: seconds after which a second request is sent for the same photo, None disables hedging
+        :param deadline: seconds all prefetches may take together, None waits for every photo
+        """
+        if max_workers < 1:
+            raise ValueError(f"max_workers must be at least 1, but is '{max_workers}'")
+
+        self.max_workers = max_workers
+        self.cache = cache
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+        self.deadline = deadline
+        self.fetch_time = 0.0  # seconds spent waiting in prefetch, counted against the deadline
+        self.session = requests.Session()
+        # room for a hedged request per download
+        self._requests = ThreadPoolExecutor(max_workers=2 * max_workers, thread_name_prefix="image-request")
+        self._in_flight = set()  # requests that have not finished yet, they use the session
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=2 * max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self._requests.shutdown(wait=False)
+        if self._in_flight:
+            # requests given up on still use the session, it is closed once they finished (bounded by the timeout)
+            threading.Thread(target=self.__close_session_when_idle, name="image-fetcher-close", daemon=True).start()
+        else:
+            self.session.close()
+
+    def fetch(self, url: str) -> Optional[ImageReader]:
+        """
+        :return: decoded image, the stale cached one if the download failed or None if neither is available
+        """
+        entry = None
+        if self.cache is not None:
+            entry = self.cache.lookup(url)
+            if entry is not None and self.cache.is_fresh(entry):
+                Metrics.count("image_cache_hits")
+                return entry.reader
+
+        try:
+            response = self.__download(url, headers=entry.validators() if entry else None)
+            if response.status_code == 304 and entry is not None:
+                Metrics.count("image_cache_revalidations")
+                return self.cache.revalidated(entry).reader
+            self.__count_download(response)
+
+            if self.cache is None:
+                return ImageReader(BytesIO(response.content))
+            return self.cache.store(url, response.content,
+                                    etag=response.headers.get("ETag"),
+                                    last_modified=response.headers.get("Last-Modified")).reader
+        except (requests.RequestException, HostUnavailable, OSError):  # OSError: content is no image
+            Metrics.count("image_fetch_failures")
+            if entry is not None:
+                Metrics.count("image_cache_stale_hits")
+                return entry.reader
+            return None
+
+    def prefetch(self, urls: Iterable[Optional[str]]) -> dict[str, Optional[ImageReader]]:
+        """
+        Downloads all given urls concurrently. Empty urls are skipped and duplicates are only fetched once.
+        :param urls: image urls, e.g. Person.image_url of every person of a roster
+        :return: mapping of url to the (decoded) image, None if it could not be fetched before the deadline
+        """
+        unique_urls = list(dict.fromkeys(url for url in urls if url))
+        if not unique_urls:
+            return {}
+
+        remaining = None if self.deadline is None else self.deadline - self.fetch_time
+        if remaining is not None and remaining <= 0:
+            images = {url: self.__cached(url) for url in unique_urls}
+            missing = sum(image is None for image in images.values())
+            if missing:
+                Metrics.count("image_fetch_deadline_exceeded", missing)
+            return images
+
+        start = time.perf_counter()
+        executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(unique_urls)))
+        try:
+            # run every download in a copy of the caller's context, so it is counted in the current render's metrics
+            futures = [executor.submit(contextvars.copy_context().run, self.fetch, url) for url in unique_urls]
+            done, not_done = wait(futures, timeout=remaining)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)  # late downloads still fill the cache for next time
+            self.fetch_time += time.perf_counter() - start
+
+        if not_done:
+            Metrics.count("image_fetch_deadline_exceeded", len(not_done))
+        return {url: future.result() if future in done else None for url, future in zip(unique_urls, futures)}
+
+    def __download(self, url: str, headers: Optional[dict[str, str]]) -> requests.Response:
+        """
+        Requests the url, hedged by a second request if the first one is slow.
+        :raises HostUnavailable: if the circuit of the host is open
+        :raises requests.RequestException: if no request succeeded
+        """
+        host = urlsplit(url).netloc
+        self.circuit_breaker.check(host)
+
+        attempts = [self.__submit(url, headers)]
+        if self.hedge_after is not None and not wait(attempts, timeout=self.hedge_after).done:
+            Metrics.count("image_fetches_hedged")
+            attempts.append(self.__submit(url, headers))
+
+        error = None
+        for attempt in as_completed(attempts):
+            try:
+                response = attempt.result()
+            except requests.HTTPError as e:
+                if e.response.status_code < 500:  # the host is fine, the photo is missing
+                    self.circuit_breaker.record_success(host)
+                    raise
+                error = e
+            except requests.RequestException as e:
+                error = e
+            else:
+                self.circuit_breaker.record_success(host)
+                return response
+
+        self.circuit_breaker.record_failure(host)
+        raise error
+
+    def __cached(self, url: str) -> Optional[ImageReader]:
+        """
+        :return: cached image regardless of its freshness, None if it is not cached
+        """
+        entry = self.cache.lookup(url) if self.cache is not None else None
+        if entry is None:
+            return None
+        Metrics.count("image_cache_hits" if self.cache.is_fresh(entry) else "image_cache_stale_hits")
+        return entry.reader
+
+    def __submit(self, url: str, headers: Optional[dict[str, str]]) -> Future:
+        attempt = self._requests.submit(self.__get, url, headers)
+        self._in_flight.add(attempt)
+        attempt.add_done_callback(self._in_flight.discard)
+        return attempt
+
+    def __close_session_when_idle(self):
+        self._requests.shutdown(wait=True)
+        self.session.close()
+
+    def __get(self, url: str, headers: Optional[dict[str, str]]) -> requests.Response:
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+        response.raise_for_status()
+        return response
+
+    @staticmethod
+    def __count_download(response: requests.Response):
+        Metrics.count("images_fetched")
+        Metrics.count("image_bytes_fetched", len(response.content))
@@ -0,0 +1,86 @@
+import math
+import threading
+import weakref
+from io import BytesIO
+
+from PIL import Image
+from reportlab.lib.utils import ImageReader
+
+
+class ImageNormalizer:
+    """
+    Resamples photos and icons to the resolution they are actually printed at, instead of embedding them with
+    their original pixel size. Images that are already small enough and have no removable alpha channel are passed
+    through untouched, so JPEGs are embedded without re-encoding.
+    """
+    dpi = 300
+    jpeg_quality = 85
+
+    _normalized = weakref.WeakKeyDictionary()  # source image -> {target size: normalized image, None = source}
+    _lock = threading.Lock()
+
+    @classmethod
+    def normalize(cls, image: ImageReader, width, height, fit=True, dpi=None) -> ImageReader:
+        """
+        :param image: source image
+        :param width: drawn width (in pt)
+        :param height: drawn height (in pt)
+        :param fit: True if the image is drawn with preserved aspect ratio within the box, False if it is stretched
+        :param dpi: target resolution, defaults to ImageNormalizer.dpi
+        :return: image with at most the pixels needed for the target resolution, memoized per source and size
+        """
+        target = cls.target_size(width, height, dpi or cls.dpi)
+        with cls._lock:
+            results = cls._normalized.setdefault(image, {})
+            if (key := (target, fit)) in results:
+                return results[key] or image
+
+        normalized = cls.__normalize(image, target, fit)
+        with cls._lock:  # a passed through source is not referenced by its own entry, it could never be freed
+            results[key] = normalized if normalized is not image else None
+        return normalized
+
+    @staticmethod
+    def target_size(width, height, dpi) -> tuple[int, int]:
+        """
+        :return: pixels needed to draw a box of the given size (in pt) at the given resolution
+        """
+        return math.ceil(width / 72 * dpi), math.ceil(height / 72 * dpi)
+
+    @classmethod
+    def __normalize(cls, reader: ImageReader, target: (int, int), fit: bool) -> ImageReader:
+        image = reader._image
+        scale = (min if fit else max)(target[0] / image.width, target[1] / image.height)
+        needs_resampling = scale < 1
+        has_removable_alpha = cls.__has_alpha(image) and not cls.__uses_alpha(image)
+
+        if not needs_resampling and not has_removable_alpha:
+            return reader  # pass through, e.g. a small JPEG is embedded as is
+
+        if cls.__has_alpha(image):
+            image = image.convert("RGBA" if not has_removable_alpha else "RGB")
+        elif image.mode not in ("L", "RGB"):
+            image = image.convert("RGB")
+
+        if needs_resampling:
+            image = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+                                 Image.LANCZOS)
+
+        stream = BytesIO()
+        if image.mode == "RGBA":
+            image.save(stream, format="PNG", optimize=False)
+        elif reader._image.format == "JPEG":
+            image.save(stream, format="JPEG", quality=cls.jpeg_quality)
+        else:  # keep lossless sources (e.g. icons) lossless
+            image.save(stream, format="PNG", optimize=False)
+        stream.seek(0)
+        return ImageReader(stream)
+
+    @staticmethod
+    def __has_alpha(image: Image.Image) -> bool:
+        return image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+
+    @staticmethod
+    def __uses_alpha(image: Image.Image) -> bool:
+        alpha = image.convert("RGBA").getchannel("A")
+        return alpha.getextrema()[0] < 255
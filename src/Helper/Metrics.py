@@ -0,0 +1,135 @@
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+
+class _PhaseTimer:
+    def __init__(self, metrics: "Metrics", name: str):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.metrics.add_duration(self.name, time.perf_counter() - self.start)
+
+
+class Metrics:
+    """
+    Collects the duration of render phases (fetch, layout, qr, draw, save, ...) and counters (cards, fetched images,
+    cache hits, written bytes) of one render. The recorder is bound to the current context by Metrics.record, the
+    hot path only calls Metrics.phase and Metrics.count, which do nothing but a context lookup if no render is
+    recorded. Phases may be nested, e.g. qr is part of draw.
+    Finished recordings are added to Metrics.totals, the process wide totals exported in Prometheus format.
+    """
+    _current: ContextVar[Optional["Metrics"]] = ContextVar("render_metrics", default=None)
+    _disabled = nullcontext()
+
+    totals: "Metrics"
+
+    def __init__(self):
+        self.durations: dict[str, float] = defaultdict(float)  # phase -> seconds
+        self.calls: dict[str, int] = defaultdict(int)  # phase -> number of timed sections
+        self.counters: dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()  # images are fetched by several threads
+
+    @classmethod
+    @contextmanager
+    def record(cls, enabled: bool = True) -> Iterator[Optional["Metrics"]]:
+        """
+        Records all phases and counters of the enclosed render and adds them to the totals afterwards.
+        :param enabled: False yields None and records nothing
+        """
+        if not enabled:
+            yield None
+            return
+
+        metrics = cls()
+        token = cls._current.set(metrics)
+        try:
+            yield metrics
+        finally:
+            cls._current.reset(token)
+            cls.totals.merge(metrics.snapshot())
+
+    @classmethod
+    def current(cls) -> Optional["Metrics"]:
+        """
+        :return: recorder of the current render, None if no render is recorded
+        """
+        return cls._current.get()
+
+    @classmethod
+    def enabled(cls) -> bool:
+        return cls._current.get() is not None
+
+    @classmethod
+    def phase(cls, name: str):
+        """
+        :return: context manager timing the enclosed section as the given phase
+        """
+        metrics = cls._current.get()
+        return cls._disabled if metrics is None else _PhaseTimer(metrics, name)
+
+    @classmethod
+    def count(cls, name: str, value: int = 1):
+        if (metrics := cls._current.get()) is not None:
+            metrics.add_count(name, value)
+
+    def add_duration(self, phase: str, seconds: float):
+        with self._lock:
+            self.durations[phase] += seconds
+            self.calls[phase] += 1
+
+    def add_count(self, name: str, value: int = 1):
+        with self._lock:
+            self.counters[name] += value
+
+    def snapshot(self) -> dict[str, dict]:
+        """
+        :return: plain copy of the recorded values, e.g. to send them from a worker process to the parent
+        """
+        with self._lock:
+            return {"durations": dict(self.durations), "calls": dict(self.calls), "counters": dict(self.counters)}
+
+    def merge(self, snapshot: dict[str, dict]):
+        with self._lock:
+            for phase, seconds in snapshot["durations"].items():
+                self.durations[phase] += seconds
+            for phase, calls in snapshot["calls"].items():
+                self.calls[phase] += calls
+            for name, value in snapshot["counters"].items():
+                self.counters[name] += value
+
+    def server_timing(self) -> str:
+        """
+        :return: value of a Server-Timing header with the duration of every phase (in ms)
+        """
+        with self._lock:
+            return ", ".join(f"{phase};dur={seconds * 1000:.1f}" for phase, seconds in self.durations.items())
+
+    def prometheus(self, prefix: str = "nametags") -> str:
+        """
+        :return: the recorded values in the Prometheus text exposition format
+        """
+        with self._lock:
+            lines = [f"# HELP {prefix}_phase_seconds_total Time spent in each render phase.",
+                     f"# TYPE {prefix}_phase_seconds_total counter"]
+            lines += [f'{prefix}_phase_seconds_total{{phase="{phase}"}} {seconds:.6f}'
+                      for phase, seconds in sorted(self.durations.items())]
+            lines += [f"# HELP {prefix}_phase_calls_total Number of timed sections of each render phase.",
+                      f"# TYPE {prefix}_phase_calls_total counter"]
+            lines += [f'{prefix}_phase_calls_total{{phase="{phase}"}} {calls}'
+                      for phase, calls in sorted(self.calls.items())]
+            lines += [f"# HELP {prefix}_events_total Render events, e.g. cards, fetched images and written bytes.",
+                      f"# TYPE {prefix}_events_total counter"]
+            lines += [f'{prefix}_events_total{{event="{name}"}} {value}'
+                      for name, value in sorted(self.counters.items())]
+        return "\n".join(lines) + "\n"
+
+
+Metrics.totals = Metrics()
@@ -0,0 +1,221 @@
+import hashlib
+from array import array
+from io import BytesIO
+from typing import BinaryIO, Union
+
+from pypdf import PdfReader
+from pypdf.generic import (ArrayObject, DecodedStreamObject, DictionaryObject, FloatObject, IndirectObject,
+                           NameObject, NumberObject, PdfObject, StreamObject)
+
+from src.Helper.FormFragment import FormFragment
+
+
+class PdfStitcher:
+    """
+    Stitches the pages of several PDF documents (e.g. chunks rendered by different workers) in order into one
+    document. Pages are written to the output as soon as they are added and their objects are copied without
+    re-encoding, so memory only grows with the current source document. Identical objects of different sources
+    (e.g. icons, the placeholder and fonts) are embedded only once. Offset and digest of every written object are kept
+    until the document is closed, they are stored compactly as they are the only memory growing with the document.
+    Pages prepared as FormFragment can also be added as form XObjects (see add_form) and placed on new pages (see
+    add_sheet), e.g. to assemble a document from cached cards.
+    """
+    CATALOG = 1
+    PAGE_TREE = 2
+
+    def __init__(self, output: BinaryIO):
+        self.output = output
+        self.offsets = array("Q", bytes(8 * (self.PAGE_TREE + 1)))  # object number -> byte offset, 0 if not written
+        self.page_numbers = array("Q")
+        self._objects: dict[bytes, int] = {}  # digest of serialized object -> object number
+        self.deduplicated_bytes = 0  # size of the objects that were skipped as duplicates
+
+        self._start = output.tell()
+        self.output.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+
+    @property
+    def page_count(self) -> int:
+        return len(self.page_numbers)
+
+    @property
+    def next_number(self) -> int:
+        return len(self.offsets)
+
+    def add_document(self, source: Union[str, bytes, BinaryIO]) -> int:
+        """
+        Appends all pages of the given document.
+        :param source: path, content or stream of a PDF document
+        :return: number of added pages
+        """
+        reader = PdfReader(BytesIO(source) if isinstance(source, bytes) else source)
+        mapping: dict[int, int] = {}  # object number in source -> object number in output
+        for page in reader.pages:
+            self.__add_page(page, mapping)
+        return len(reader.pages)
+
+    def add_form(self, fragment: FormFragment) -> int:
+        """
+        Adds the page of the fragment as form XObject, its bounding box is the page's media box. The serialized
+        objects of the fragment are written as they are, objects written before (by digest) are referenced instead.
+        They do not count as deduplicated_bytes: every fragment carries its own copy of the resources it uses, a
+        document assembled from fragments shares them like one drawn on a single canvas.
+        :return: object number of the form, to be placed by add_sheet
+        """
+        numbers = []
+        for digest, template, data in fragment.objects:
+            digest = bytes.fromhex(digest)
+            if (number := self._objects.get(digest)) is None:
+                number = self._objects[digest] = self.__reserve()
+                self.__write_raw(number, self.__fill(template, numbers), data)
+            numbers.append(number)
+
+        bbox = " ".join(f"{value:.4f}" for value in fragment.bbox)
+        form = (f"<< /Type /XObject /Subtype /Form /BBox [ {bbox} ] /Resources "
+                f"{self.__fill(fragment.resources, numbers)} {fragment.content_entries} "
+                f"/Length {len(fragment.content)} >>")
+        number = self.__reserve()
+        self.__write_raw(number, form, fragment.content)
+        return number
+
+    def add_sheet(self, width: float, height: float, placements: list[tuple[int, float, float]]):
+        """
+        Appends a new page of the given size (in pt) showing forms added by add_form.
+        :param placements: object number of the form and the position of its origin on the page
+        """
+        names = {number: f"/Fm{number}" for number, _, _ in placements}
+        content = DecodedStreamObject()
+        content.set_data("".join(f"q 1 0 0 1 {x:.4f} {y:.4f} cm {names[number]} Do Q\n"
+                                 for number, x, y in placements).encode("ascii"))
+        content_number = self.__reserve()
+        self.__write_object(content_number, content.flate_encode())
+
+        page = DictionaryObject({
+            NameObject("/Type"): NameObject("/Page"),
+            NameObject("/Parent"): IndirectObject(self.PAGE_TREE, 0, None),
+            NameObject("/MediaBox"): ArrayObject(FloatObject(value) for value in (0, 0, width, height)),
+            NameObject("/Resources"): DictionaryObject({
+                NameObject("/XObject"): DictionaryObject({NameObject(name): IndirectObject(number, 0, None)
+                                                          for number, name in names.items()}),
+            }),
+            NameObject("/Contents"): IndirectObject(content_number, 0, None),
+        })
+        number = self.__reserve()
+        self.__write_object(number, page)
+        self.page_numbers.append(number)
+
+    def close(self):
+        """
+        Writes page tree, catalog and cross-reference table. The output stream is not closed.
+        """
+        page_tree = DictionaryObject({
+            NameObject("/Type"): NameObject("/Pages"),
+            NameObject("/Kids"): ArrayObject(IndirectObject(n, 0, None) for n in self.page_numbers),
+            NameObject("/Count"): NumberObject(len(self.page_numbers)),
+        })
+        self.__write_object(self.PAGE_TREE, page_tree)
+        self.__write_object(self.CATALOG, DictionaryObject({
+            NameObject("/Type"): NameObject("/Catalog"),
+            NameObject("/Pages"): IndirectObject(self.PAGE_TREE, 0, None),
+        }))
+
+        xref_offset = self.output.tell() - self._start
+        self.output.write(f"xref\n0 {self.next_number}\n".encode())
+        self.output.write(b"0000000000 65535 f \n")
+        for number in range(1, self.next_number):
+            if self.offsets[number]:
+                self.output.write(f"{self.offsets[number]:010d} 00000 n \n".encode())
+            else:  # reserved but never written
+                self.output.write(b"0000000000 65535 f \n")
+        self.output.write(f"trailer\n<< /Size {self.next_number} /Root {self.CATALOG} 0 R >>\n"
+                          f"startxref\n{xref_offset}\n%%EOF\n".encode())
+
+    def __add_page(self, page: DictionaryObject, mapping: dict[int, int]):
+        page_dict = DictionaryObject()
+        for key, value in page.items():
+            if key != "/Parent":
+                page_dict[NameObject(key)] = self.__copy(value, mapping, set())
+        page_dict[NameObject("/Parent")] = IndirectObject(self.PAGE_TREE, 0, None)
+
+        number = self.__reserve()
+        self.__write_object(number, page_dict)
+        self.page_numbers.append(number)
+
+    def __copy(self, obj: PdfObject, mapping: dict[int, int], in_progress: set[int]) -> PdfObject:
+        """
+        Copies an object of the source document, writing all indirectly referenced objects (children first).
+        """
+        if isinstance(obj, IndirectObject):
+            return IndirectObject(self.__copy_reference(obj, mapping, in_progress), 0, None)
+        if isinstance(obj, StreamObject):
+            copy = type(obj)()
+            copy._data = obj._data
+            for key, value in obj.items():
+                if key != "/Length":
+                    copy[NameObject(key)] = self.__copy(value, mapping, in_progress)
+            return copy
+        if isinstance(obj, DictionaryObject):
+            return DictionaryObject({NameObject(key): self.__copy(value, mapping, in_progress)
+                                     for key, value in obj.items()})
+        if isinstance(obj, ArrayObject):
+            return ArrayObject(self.__copy(value, mapping, in_progress) for value in obj)
+        return obj
+
+    def __copy_reference(self, ref: IndirectObject, mapping: dict[int, int], in_progress: set[int]) -> int:
+        if ref.idnum in mapping:
+            return mapping[ref.idnum]
+        if ref.idnum in in_progress:  # reference cycle -> number is needed before the object is written
+            mapping[ref.idnum] = self.__reserve()
+            return mapping[ref.idnum]
+
+        in_progress.add(ref.idnum)
+        copy = self.__copy(ref.get_object(), mapping, in_progress)
+        in_progress.discard(ref.idnum)
+
+        if ref.idnum in mapping:  # number was handed out during a cycle
+            number = mapping[ref.idnum]
+            self.__write_object(number, copy)
+            return number
+
+        serialized = BytesIO()
+        copy.write_to_stream(serialized)
+        digest = hashlib.sha256(serialized.getvalue()).digest()
+        if digest in self._objects:
+            self.deduplicated_bytes += serialized.tell()
+            mapping[ref.idnum] = self._objects[digest]
+            return mapping[ref.idnum]
+
+        number = mapping[ref.idnum] = self.__reserve()
+        self.__write_object(number, copy)
+        self._objects[digest] = number
+        return number
+
+    def __reserve(self) -> int:
+        self.offsets.append(0)
+        return len(self.offsets) - 1
+
+    @staticmethod
+    def __fill(template: list, numbers: list[int]) -> str:
+        return "".join(part if isinstance(part, str) else f"{numbers[part]} 0 R" for part in template)
+
+    def __write_raw(self, number: int, serialized: str, stream: bytes = None):
+        """
+        Writes an object serialized by FormFragment, followed by its stream data if it is a stream.
+        """
+        self.offsets[number] = self.output.tell() - self._start
+        self.output.write(f"{number} 0 obj\n{serialized}".encode("latin-1"))
+        if stream is not None:
+            self.output.write(b"\nstream\n" + stream + b"\nendstream")
+        self.output.write(b"\nendobj\n")
+
+    def __write_object(self, number: int, obj: PdfObject):
+        self.offsets[number] = self.output.tell() - self._start
+        self.output.write(f"{number} 0 obj\n".encode())
+        obj.write_to_stream(self.output)
+        self.output.write(b"\nendobj\n")
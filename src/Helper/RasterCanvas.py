@@ -0,0 +1,281 @@
+import functools
+import math
+import os
+
+import reportlab
+from PIL import Image, ImageDraw, ImageFont
+from reportlab.lib import colors
+from reportlab.lib.utils import ImageReader
+
+from src.Helper.TextMetrics import TextMetrics
+
+
+def _recordable(method):
+    """
+    Drawing operations called between beginForm and endForm are recorded and replayed by doForm.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self._recording is not None:
+            self._recording.append((method, args, kwargs))
+            return None
+        return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+class RasterPath:
+    """
+    Minimal replacement of reportlab's PDFPathObject, consisting of closed polygons.
+    """
+
+    def __init__(self):
+        self.polygons: list[list[tuple[float, float]]] = []
+
+    def moveTo(self, x, y):
+        self.polygons.append([(x, y)])
+
+    def lineTo(self, x, y):
+        self.polygons[-1].append((x, y))
+
+    def rect(self, x, y, width, height):
+        self.polygons.append([(x, y), (x + width, y), (x + width, y + height), (x, y + height)])
+
+    def close(self):
+        pass  # polygons are always drawn closed
+
+
+class RasterCanvas:
+    """
+    Draws directly into a PIL image and implements the part of reportlab's canvas API used by the blocks, so cards
+    can be rasterized without rendering and converting a PDF first.
+    Coordinates are given in pt with the origin in the bottom left corner, like on a reportlab canvas.
+    """
+    font_dir = os.path.join(os.path.dirname(reportlab.__file__), "fonts")
+    font_files = {"Helvetica": "Vera.ttf",  # metrics are matched to Helvetica per string, see drawString
+                  "Helvetica-Bold": "VeraBd.ttf"}
+
+    def __init__(self, pagesize: (float, float), dpi: int = 200, background=colors.white):
+        self.pagesize = pagesize
+        self.dpi = dpi
+        self.pixel_scale = dpi / 72
+        self.image = Image.new("RGB",
+                               (round(pagesize[0] * self.pixel_scale), round(pagesize[1] * self.pixel_scale)),
+                               self.__to_rgba(background))
+        self.draw = ImageDraw.Draw(self.image)
+
+        self._ctm = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)  # user space -> pt, same layout as the PDF matrix
+        self._fill_color = colors.black
+        self._stroke_color = colors.black
+        self._font_name = "Helvetica"
+        self._font_size = 12
+        self._line_width = 1
+        self._state_stack = []
+
+        self._forms: dict[str, list] = {}
+        self._recording = None
+        self._recording_name = None
+
+    # ---------- graphics state ----------
+
+    @_recordable
+    def saveState(self):
+        self._state_stack.append((self._ctm, self._fill_color, self._stroke_color, self._font_name,
+                                  self._font_size, self._line_width))
+
+    @_recordable
+    def restoreState(self):
+        (self._ctm, self._fill_color, self._stroke_color, self._font_name,
+         self._font_size, self._line_width) = self._state_stack.pop()
+
+    @_recordable
+    def translate(self, dx, dy):
+        self.__concat((1, 0, 0, 1, dx, dy))
+
+    @_recordable
+    def rotate(self, theta):
+        rad = math.radians(theta)
+        self.__concat((math.cos(rad), math.sin(rad), -math.sin(rad), math.cos(rad), 0, 0))
+
+    @_recordable
+    def scale(self, x, y):
+        self.__concat((x, 0, 0, y, 0, 0))
+
+    @_recordable
+    def setFillColor(self, color, alpha=None):
+        self._fill_color = color
+
+    @_recordable
+    def setStrokeColor(self, color, alpha=None):
+        self._stroke_color = color
+
+    @_recordable
+    def setFont(self, psfontname, size, leading=None):
+        self._font_name = psfontname
+        self._font_size = size
+
+    @_recordable
+    def setLineWidth(self, width):
+        self._line_width = width
+
+    # ---------- drawing ----------
+
+    @_recordable
+    def rect(self, x, y, width, height, stroke=1, fill=0):
+        self.__polygon([(x, y), (x + width, y), (x + width, y + height), (x, y + height)], stroke, fill)
+
+    @_recordable
+    def roundRect(self, x, y, width, height, radius, stroke=1, fill=0):
+        if not self.__is_axis_aligned():
+            self.rect(x, y, width, height, stroke, fill)
+            return
+
+        (x0, y0), (x1, y1) = self.__to_pixel(x, y + height), self.__to_pixel(x + width, y)
+        box = (min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1))
+        self.draw.rounded_rectangle(box, radius * self.__pixel_factor(),
+                                    fill=self.__to_rgba(self._fill_color) if fill else None,
+                                    outline=self.__to_rgba(self._stroke_color) if stroke else None,
+                                    width=self.__line_width_px() if stroke else 0)
+
+    @_recordable
+    def line(self, x1, y1, x2, y2):
+        self.draw.line([self.__to_pixel(x1, y1), self.__to_pixel(x2, y2)],
+                       fill=self.__to_rgba(self._stroke_color), width=self.__line_width_px())
+
+    @_recordable
+    def lines(self, linelist):
+        for x1, y1, x2, y2 in linelist:
+            self.line(x1, y1, x2, y2)
+
+    def beginPath(self) -> RasterPath:
+        return RasterPath()
+
+    @_recordable
+    def drawPath(self, path: RasterPath, stroke=1, fill=0, fillMode=None):
+        for polygon in path.polygons:
+            self.__polygon(polygon, stroke, fill)
+
+    @_recordable
+    def drawString(self, x, y, text, mode=None, charSpace=0, direction=None, wordSpace=None):
+        if not text:
+            return
+
+        # Vera is slightly wider than Helvetica -> fit the text to the width reportlab would use
+        target_width = TextMetrics.string_width(text, self._font_name, self._font_size) * self.__pixel_factor()
+        font = self.__get_font(self._font_name, max(1, round(self._font_size * self.__pixel_factor())))
+        if (actual_width := font.getlength(text)) > 0:
+            font = self.__get_font(self._font_name, max(1, round(font.size * target_width / actual_width)))
+
+        self.draw.text(self.__to_pixel(x, y), text, font=font, fill=self.__to_rgba(self._fill_color), anchor="ls")
+
+    @_recordable
+    def drawImage(self, image, x, y, width=None, height=None, mask=None, preserveAspectRatio=False, anchor="c",
+                  **kwargs):
+        source = image._image if isinstance(image, ImageReader) else Image.open(image)
+        source = source.convert("RGBA")
+        width = source.width if width is None else width
+        height = source.height if height is None else height
+
+        if preserveAspectRatio:  # center image within box
+            scale = min(width / source.width, height / source.height)
+            x += (width - source.width * scale) / 2
+            y += (height - source.height * scale) / 2
+            width, height = source.width * scale, source.height * scale
+
+        # affine map from source pixel (u, v) to canvas pixel
+        origin = self.__to_pixel(x, y + height)
+        u_axis = [p - o for p, o in zip(self.__to_pixel(x + width, y + height), origin)]
+        v_axis = [p - o for p, o in zip(self.__to_pixel(x, y), origin)]
+        a, b, c = u_axis[0] / source.width, v_axis[0] / source.height, origin[0]
+        d, e, f = u_axis[1] / source.width, v_axis[1] / source.height, origin[1]
+
+        corners = [origin, (origin[0] + u_axis[0], origin[1] + u_axis[1]),
+                   (origin[0] + v_axis[0], origin[1] + v_axis[1]),
+                   (origin[0] + u_axis[0] + v_axis[0], origin[1] + u_axis[1] + v_axis[1])]
+        left, top = math.floor(min(p[0] for p in corners)), math.floor(min(p[1] for p in corners))
+        right, bottom = math.ceil(max(p[0] for p in corners)), math.ceil(max(p[1] for p in corners))
+        if right <= left or bottom <= top:
+            return
+
+        # inverse map (canvas pixel relative to bounding box -> source pixel), as expected by PIL
+        det = a * e - b * d
+        inverse = (e / det, -b / det, (b * (f - top) - e * (c - left)) / det,
+                   -d / det, a / det, (d * (c - left) - a * (f - top)) / det)
+        tile = source.transform((right - left, bottom - top), Image.AFFINE, inverse, resample=Image.BILINEAR)
+        self.image.paste(tile, (left, top), tile)
+
+    # ---------- forms ----------
+
+    def beginForm(self, name, lowerx=0, lowery=0, upperx=None, uppery=None):
+        self._recording = []
+        self._recording_name = name
+
+    def endForm(self, **extra_attributes):
+        self._forms[self._recording_name] = self._recording
+        self._recording = None
+        self._recording_name = None
+
+    def hasForm(self, name) -> bool:
+        return name in self._forms
+
+    @_recordable
+    def doForm(self, name):
+        self.saveState()
+        for method, args, kwargs in self._forms[name]:
+            method(self, *args, **kwargs)
+        self.restoreState()
+
+    # ---------- document ----------
+
+    def showPage(self):
+        pass  # previews consist of a single page
+
+    def save(self):
+        pass
+
+    def get_image(self) -> Image.Image:
+        return self.image
+
+    # ---------- helpers ----------
+
+    def __concat(self, m):
+        a, b, c, d, e, f = self._ctm
+        self._ctm = (m[0] * a + m[1] * c, m[0] * b + m[1] * d,
+                     m[2] * a + m[3] * c, m[2] * b + m[3] * d,
+                     m[4] * a + m[5] * c + e, m[4] * b + m[5] * d + f)
+
+    def __to_pixel(self, x, y) -> tuple[float, float]:
+        a, b, c, d, e, f = self._ctm
+        page_x, page_y = a * x + c * y + e, b * x + d * y + f
+        return page_x * self.pixel_scale, (self.pagesize[1] - page_y) * self.pixel_scale
+
+    def __pixel_factor(self) -> float:
+        """
+        :return: pixels per unit of the current user space
+        """
+        a, b, c, d, _, _ = self._ctm
+        return math.sqrt(abs(a * d - b * c)) * self.pixel_scale
+
+    def __line_width_px(self) -> int:
+        return max(1, round(self._line_width * self.__pixel_factor()))
+
+    def __is_axis_aligned(self) -> bool:
+        return self._ctm[1] == 0 and self._ctm[2] == 0
+
+    def __polygon(self, points, stroke, fill):
+        pixels = [self.__to_pixel(x, y) for x, y in points]
+        self.draw.polygon(pixels,
+                          fill=self.__to_rgba(self._fill_color) if fill else None,
+                          outline=self.__to_rgba(self._stroke_color) if stroke else None,
+                          width=self.__line_width_px() if stroke else 0)
+
+    @staticmethod
+    def __to_rgba(color) -> tuple[int, int, int, int]:
+        r, g, b = (round(channel * 255) for channel in color.rgb())
+        return r, g, b, round(getattr(color, "alpha", 1) * 255)
+
+    @classmethod
+    @functools.lru_cache(maxsize=64)
+    def __get_font(cls, name, size) -> ImageFont.FreeTypeFont:
+        return ImageFont.truetype(os.path.join(cls.font_dir, cls.font_files.get(name, "Vera.ttf")), size)
@@ -0,0 +1,174 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import BinaryIO, Optional
+
+from pydantic import BaseModel
+
+
+class ResponseCache:
+    """
+    Cache of rendered responses (PDFs, previews), addressed by a canonical hash of the request:
+        - in-process LRU of the response bytes, limited by their total size
+        - optional on-disk store of the responses, named by their key
+    The key also serves as ETag, so a client revalidating with If-None-Match can be answered with 304 without
+    rendering. Entries older than max_age are rendered again, e.g. to pick up new photos behind the same urls.
+    """
+    version = 1  # part of every key, increase whenever the rendering changes
+
+    def __init__(self, cache_dir: str = None, use_disk: bool = False, max_memory_bytes: int = 64 * 1024 ** 2,
+                 max_disk_bytes: int = 512 * 1024 ** 2, max_item_bytes: int = 16 * 1024 ** 2, max_age: float = 600):
+        """
+        :param cache_dir: directory of the disk tier, defaults to a folder in the system temp dir
+        :param use_disk: whether responses are stored on disk as well, e.g. to share them between workers
+        :param max_memory_bytes: least recently used responses are evicted once the memory tier exceeds this size
+        :param max_disk_bytes: oldest responses are evicted once the disk tier exceeds this size
+        :param max_item_bytes: larger responses are not cached
+        :param max_age: seconds a response is reused
+        """
+        self.cache_dir = cache_dir or os.path.join(tempfile.gettempdir(), "mock-nametags", "responses")
+        self.use_disk = use_disk
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.max_item_bytes = max_item_bytes
+        self.max_age = max_age
+
+        self._memory: OrderedDict[str, tuple[bytes, float]] = OrderedDict()  # key -> (content, stored at)
+        self._memory_bytes = 0
+        self._disk: Optional[OrderedDict[str, int]] = None  # file name -> size, oldest first, scanned on first store
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def key(cls, endpoint: str, body: BaseModel, **params) -> str:
+        """
+        :param endpoint: name of the endpoint, so equal bodies of different endpoints do not collide
+        :param params: query parameters the response depends on, e.g. paper_size or dpi
+        :return: stable hash of the request, independent of the key order and formatting of the sent json
+        """
+        payload = json.dumps({"version": cls.version, "endpoint": endpoint, "body": body.model_dump(mode="json"),
+                              "params": params}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def etag(key: str) -> str:
+        return f'"{key}"'
+
+    @staticmethod
+    def matches(if_none_match: Optional[str], key: str) -> bool:
+        """
+        :param if_none_match: value of the If-None-Match header of the request
+        :return: whether the client holds the response of the given key
+        """
+        if not if_none_match:
+            return False
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or ResponseCache.etag(key) in tags
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        :return: response stored within max_age, else None
+        """
+        with self._lock:
+            if (entry := self._memory.get(key)) is not None:
+                content, stored_at = entry
+                if self.__is_fresh(stored_at):
+                    self._memory.move_to_end(key)
+                    return content
+                self.__forget(key)
+
+        if not self.use_disk:
+            return None
+
+        path = self.__path(key)
+        try:
+            stored_at = os.stat(path).st_mtime
+            if not self.__is_fresh(stored_at):
+                return None
+            with open(path, "rb") as f:
+                content = f.read()
+        except OSError:
+            return None  # missing or evicted -> treat as miss
+
+        self.__remember(key, content, stored_at)
+        return content
+
+    def store(self, key: str, buffer: BinaryIO):
+        """
+        Stores the content of the buffer (from its start) unless it exceeds max_item_bytes.
+        """
+        size = buffer.seek(0, os.SEEK_END)
+        if size > self.max_item_bytes:
+            return
+
+        buffer.seek(0)
+        content = buffer.read()
+        self.__remember(key, content, time.time())
+        if self.use_disk:
+            self.__write_atomic(self.__path(key), content)
+            self.__evict_disk(os.path.basename(self.__path(key)), len(content))
+
+    def clear_memory(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+
+    def __is_fresh(self, stored_at: float) -> bool:
+        return time.time() - stored_at < self.max_age
+
+    def __remember(self, key: str, content: bytes, stored_at: float):
+        with self._lock:
+            self.__forget(key)
+            self._memory[key] = (content, stored_at)
+            self._memory_bytes += len(content)
+            while self._memory_bytes > self.max_memory_bytes and len(self._memory) > 1:
+                self.__forget(next(iter(self._memory)))
+
+    def __forget(self, key: str):
+        if (entry := self._memory.pop(key, None)) is not None:
+            self._memory_bytes -= len(entry[0])
+
+    def __evict_disk(self, stored_name: str, stored_size: int):
+        """
+        Accounts for the stored response and removes the oldest ones while the disk tier exceeds max_disk_bytes. The
+        directory is only listed once, afterwards its size is tracked by the stores of this instance.
+        """
+        with self._lock:
+            if self._disk is None:
+                self.__scan_disk()
+            self._disk_bytes += stored_size - self._disk.pop(stored_name, 0)
+            self._disk[stored_name] = stored_size
+
+            while self._disk_bytes > self.max_disk_bytes and self._disk:
+                name, size = self._disk.popitem(last=False)
+                self._disk_bytes -= size
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    continue  # removed by another worker
+
+    def __scan_disk(self):
+        responses = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".bin"):
+                try:
+                    stat = os.stat(os.path.join(self.cache_dir, name))
+                except OSError:
+                    continue  # removed by another worker
+                responses.append((stat.st_mtime, stat.st_size, name))
+        self._disk = OrderedDict((name, size) for _, size, name in sorted(responses))
+        self._disk_bytes = sum(self._disk.values())
+
+    def __write_atomic(self, path: str, content: bytes):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    def __path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + ".bin")
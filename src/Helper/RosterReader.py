@@ -0,0 +1,68 @@
+import codecs
+import csv
+import json
+from typing import Callable, Iterable, Iterator, Literal
+
+from src.FormatClasses import Person
+
+
+class RosterReader:
+    """
+    Reads roster exports person by person, so a roster can be rendered while it is still being read. Every person
+    is validated as soon as its line is read, invalid ones raise a ValueError naming the line.
+    Supported formats:
+        - NDJSON: one person per line in the export format of Person.from_json
+        - CSV: header with the keys of Person.from_json, lists (qualifications, instructions) are separated by ';',
+               instructions are given as 'vehicle:value', e.g. 'HLF:1;TLF:0', the column copies is optional
+    """
+    list_separator = ";"
+    instruction_separator = ":"
+    true_values = {"1", "true", "yes", "x", "ja"}
+
+    @classmethod
+    def read(cls, lines: Iterable[bytes], fmt: Literal["ndjson", "csv"]) -> Iterator[Person]:
+        """
+        :param lines: utf-8 encoded lines, e.g. a file opened in binary mode
+        """
+        return cls.read_ndjson(lines) if fmt == "ndjson" else cls.read_csv(lines)
+
+    @classmethod
+    def read_ndjson(cls, lines: Iterable[bytes]) -> Iterator[Person]:
+        for line_nr, line in enumerate(codecs.iterdecode(lines, "utf-8-sig"), start=1):
+            if line.strip():
+                yield cls.__parse(line_nr, lambda: json.loads(line))
+
+    @classmethod
+    def read_csv(cls, lines: Iterable[bytes]) -> Iterator[Person]:
+        reader = csv.DictReader(codecs.iterdecode(lines, "utf-8-sig"))  # exports of spreadsheets often start with a BOM
+        for row in reader:
+            yield cls.__parse(reader.line_num, lambda: cls.__from_csv_row(row))
+
+    @staticmethod
+    def __parse(line_nr: int, load: Callable[[], dict]) -> Person:
+        try:
+            return Person.from_json(load())
+        except (ValueError, KeyError, TypeError) as e:  # pydantic's ValidationError is a ValueError
+            raise ValueError(f"Invalid person in line {line_nr}: {e!r}") from e
+
+    @classmethod
+    def __from_csv_row(cls, row: dict[str, str]) -> dict:
+        def cell(key: str) -> str | None:
+            return (row.get(key) or "").strip() or None
+
+        def items(key: str) -> list[str]:
+            return [item.strip() for item in (cell(key) or "").split(cls.list_separator) if item.strip()]
+
+        instructions = []
+        for item in items("instructions"):
+            vehicle, _, value = item.partition(cls.instruction_separator)
+            instructions.append({"vehicle": vehicle.strip(), "value": value.strip().lower() in cls.true_values})
+
+        return {"first_name": cell("first_name"),
+                "last_name": cell("last_name"),
+                "personnel_nr": cell("personnel_nr"),
+                "image_url": cell("image_url"),
+                "function": cell("function"),
+                "qualifications": items("qualifications"),
+                "instructions": instructions,
+                "copies": int(copies) if (copies := cell("copies")) else None}
@@ -0,0 +1,146 @@
+from reportlab.pdfgen import canvas
+
+
+class StateCanvas:
+    """
+    Wraps a canvas (reportlab's Canvas or RasterCanvas) and skips setFillColor, setStrokeColor, setFont and
+    setLineWidth calls that set the value which is already current. Runs of lines and of stroked (unfilled)
+    rectangles are coalesced into one path each. Everything else is passed to the wrapped canvas, pending lines and
+    rectangles are written before.
+    The tracked state follows saveState/restoreState. It is reset at the start of every form and page, also if the
+    page was finished on the wrapped canvas directly.
+    """
+    def __init__(self, c: canvas):
+        self.canvas = c
+        self._state: dict[str, tuple] = {}  # setter name -> arguments of the current value
+        self._stack: list[dict[str, tuple]] = []
+        self._forms: list[tuple[dict[str, tuple], list[dict[str, tuple]]]] = []  # state and stack outside the form
+        self._stream = self.__current_stream()
+
+        self._lines: list[tuple[float, float, float, float]] = []
+        self._rects: list[tuple[float, float, float, float]] = []
+
+    @classmethod
+    def wrap(cls, c) -> "StateCanvas":
+        """
+        :return: the wrapper of the given canvas, there is only one per canvas so their tracked state is shared
+        """
+        if isinstance(c, StateCanvas):
+            return c
+        if (wrapper := getattr(c, "state_canvas", None)) is None:  # kept on the canvas, lives as long as the canvas
+            wrapper = c.state_canvas = cls(c)
+        return wrapper
+
+    def __getattr__(self, name):
+        # any other operation may depend on the order of drawing -> write pending lines and rectangles first
+        self.flush()
+        return getattr(self.canvas, name)
+
+    # ---------- graphics state ----------
+
+    def setFillColor(self, color, alpha=None):
+        self.__set("setFillColor", color, alpha)
+
+    def setStrokeColor(self, color, alpha=None):
+        self.__set("setStrokeColor", color, alpha)
+
+    def setFont(self, psfontname, size, leading=None):
+        self.__set("setFont", psfontname, size, leading)
+
+    def setLineWidth(self, width):
+        self.__set("setLineWidth", width)
+
+    def saveState(self):
+        self.flush()
+        self.canvas.saveState()
+        self._stack.append(dict(self._state))
+
+    def restoreState(self):
+        self.flush()
+        self.canvas.restoreState()
+        self._state = self._stack.pop() if self._stack else {}
+
+    # ---------- coalesced drawing ----------
+
+    def line(self, x1, y1, x2, y2):
+        self.__flush_rects()
+        self._lines.append((x1, y1, x2, y2))
+
+    def lines(self, linelist):
+        self.__flush_rects()
+        self._lines.extend(linelist)
+
+    def rect(self, x, y, width, height, stroke=1, fill=0):
+        if stroke and not fill:
+            self.__flush_lines()
+            self._rects.append((x, y, width, height))
+            return
+
+        self.flush()
+        self.canvas.rect(x, y, width, height, stroke=stroke, fill=fill)
+
+    def flush(self):
+        """
+        Writes pending lines and rectangles, must be called before the page is finished on the wrapped canvas.
+        """
+        self.__flush_lines()
+        self.__flush_rects()
+
+    # ---------- pages and forms ----------
+
+    def beginForm(self, name, lowerx=0, lowery=0, upperx=None, uppery=None):
+        self.flush()
+        self.canvas.beginForm(name, lowerx, lowery, upperx, uppery)
+        self._forms.append((self._state, self._stack))
+        self._state, self._stack = {}, []  # form content is drawn in the state of the place it is used at
+        self._stream = self.__current_stream()
+
+    def endForm(self, **extra_attributes):
+        self.flush()
+        self.canvas.endForm(**extra_attributes)
+        self._state, self._stack = self._forms.pop()
+        self._stream = self.__current_stream()
+
+    def showPage(self):
+        self.flush()
+        self.canvas.showPage()
+        self._state, self._stack = {}, []
+        self._stream = self.__current_stream()
+
+    # ---------- helpers ----------
+
+    def __set(self, setter: str, *args):
+        if (stream := self.__current_stream()) is not self._stream:  # new page started on the wrapped canvas
+            self._state, self._stack = {}, []
+            self._stream = stream
+
+        current = self._state.get(setter)
+        if current is not None and all(type(a) is type(b) and a == b for a, b in zip(current, args)):
+            return
+
+        self.flush()
+        getattr(self.canvas, setter)(*args)
+        self._state[setter] = args
+
+    def __current_stream(self):
+        """
+        :return: content stream of the page or form currently drawn on (None for canvases without streams)
+        """
+        return getattr(self.canvas, "_code", None)
+
+    def __flush_lines(self):
+        if self._lines:
+            lines, self._lines = self._lines, []
+            self.canvas.lines(lines) if len(lines) > 1 else self.canvas.line(*lines[0])
+
+    def __flush_rects(self):
+        if self._rects:
+            rects, self._rects = self._rects, []
+            if len(rects) == 1:
+                self.canvas.rect(*rects[0], stroke=1, fill=0)
+                return
+
+            path = self.canvas.beginPath()
+            for x, y, width, height in rects:
+                path.rect(x, y, width, height)
+            self.canvas.drawPath(path, stroke=1, fill=0)
@@ -0,0 +1,13 @@
+from functools import lru_cache
+
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+
+class TextMetrics:
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def string_width(text: str, font: str, font_size: float) -> float:
+        """
+        Memoized version of reportlab's stringWidth, the same labels (roles, vehicles, functions) occur on every card.
+        """
+        return stringWidth(text, font, font_size)
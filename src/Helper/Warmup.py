@@ -0,0 +1,70 @@
+import os
+import threading
+import time
+from io import BytesIO
+
+
+class Warmup:
+    """
+    Loads everything a first render would load otherwise, so a warmed-up process answers its first request as fast
+    as any later one: the render modules, the decoded icons and placeholder, the font metrics and the fonts of the
+    raster canvas. The last two are loaded by rendering a sample card with every qualification once as PDF and as
+    preview.
+    """
+    done = False
+    _lock = threading.Lock()
+
+    @classmethod
+    def run(cls) -> dict[str, float]:
+        """
+        :return: seconds spent per step, empty if the process was warmed up before
+        """
+        with cls._lock:  # a request may trigger the warm-up while it still runs in the background
+            if cls.done:
+                return {}
+
+            durations = {}
+            for step in (cls.__import_modules, cls.__load_assets, cls.__register_fonts, cls.__render_sample):
+                start = time.perf_counter()
+                step()
+                durations[step.__name__.rsplit("__", 1)[-1]] = time.perf_counter() - start
+            cls.done = True
+            return durations
+
+    @staticmethod
+    def __import_modules():
+        import src.create_pdf  # noqa: F401
+        import src.create_preview  # noqa: F401
+
+    @staticmethod
+    def __load_assets():
+        from src.Helper.AssetRegistry import AssetRegistry
+        from src.blocks import ImageBlock, QualificationsBlock
+
+        paths = [os.path.join(QualificationsBlock.icon_dir, icon_file)
+                 for _, _, icon_file in QualificationsBlock.options.values()]
+        for path in paths + [ImageBlock.placeholder_path]:
+            AssetRegistry.get_reader(path)._image.load()  # decode now, not when the first card draws it
+
+    @staticmethod
+    def __register_fonts():
+        from reportlab.pdfbase import pdfmetrics
+
+        from src.blocks.Block import Block
+
+        for font in (Block.font, Block.font + "-Bold"):
+            pdfmetrics.getFont(font)  # loads and registers the metrics of the standard font
+
+    @staticmethod
+    def __render_sample():
+        from src.FormatClasses import JpgRequest, PdfRequest, Person
+        from src.create_pdf import create_pdf
+        from src.create_preview import create_preview
+        from src.params import Params
+
+        person = Person.from_json({"first_name": "Warm", "last_name": "Up", "personnel_nr": "0", "image_url": None,
+                                   "function": Params.all_functions[0],
+                                   "qualifications": Params.all_technical_qualifications,
+                                   "instructions": [{"vehicle": "HLF", "value": True}]})
+        create_pdf(PdfRequest(title="Warm-up", persons=[person]), "Label", BytesIO())
+        create_preview(JpgRequest(title="Warm-up", person=person), BytesIO())
@@ -1,10 +1,11 @@
 from abc import ABC, abstractmethod
-from typing import Optional
+from typing import Callable, Optional
 
 from dataclasses import dataclass
 
 from src.card import CardContext
 from src.FormatClasses import Dimensions
+from src.Helper.FormRegistry import FormRegistry
 
 
 @dataclass
@@ -25,6 +26,17 @@ class Block(ABC):
     def set_x(self, new_x):
         self.dimensions.x = new_x
 
+    def draw_chrome(self, name: str, draw_content: Callable[[], None]):
+        """
+        Draws content that is identical for all blocks of this class and size (e.g. borders) only once per canvas as
+        form and places it at the position of the block.
+        :param name: name of the content within the block class
+        :param draw_content: draws the content at the position of this block
+        """
+        FormRegistry.for_canvas(self.context.c).draw(
+            (type(self).__name__, name, self.dimensions.width, self.dimensions.height, self.font),
+            self.dimensions.x, self.dimensions.y, self.dimensions.width, self.dimensions.height, draw_content)
+
     @abstractmethod
     def draw(self):
         """ Must be implemented in child classes"""
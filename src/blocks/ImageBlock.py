@@ -1,17 +1,17 @@
 import os
 
-from reportlab.lib.utils import ImageReader
-
 from src.FontSize import FontSize
+from src.Helper.AssetRegistry import AssetRegistry
+from src.Helper.ImageCache import ImageCache
+from src.Helper.ImageFetcher import ImageFetcher
+from src.Helper.ImageNormalizer import ImageNormalizer
+from src.Helper.Metrics import Metrics
+from src.Helper.TextMetrics import TextMetrics
 from src.blocks.Block import Block
 
 from dataclasses import dataclass
 
-from io import BytesIO
-import requests
-
 from reportlab.lib import colors
-from reportlab.pdfbase.pdfmetrics import stringWidth
 
 
 @dataclass
@@ -28,8 +28,10 @@ class ImageBlock(Block):
 
     placeholder_path: str = "pictures/placeholder.png"
 
+    image_cache = ImageCache()  # shared by all cards, survives between print runs
+
     def __post_init__(self):
-        self.role_label_height = 2 * self.role_label_padding + FontSize.function_label
+        self.role_label_height = self.get_role_label_height()
 
         if self.dimensions.height is not None:
             self.img_height = self.dimensions.height - self.role_label_height  # adapt img height to role label height
@@ -39,57 +41,82 @@ class ImageBlock(Block):
             self.img_url = img_url
 
         # get image (placeholder or actual image)
-        self.img = self.__get_image()
+        with Metrics.phase("image"):
+            self.img = self.__get_image()
 
     def draw(self):
         self.__draw_image()
         self.__write_role()
-        self.__draw_border()
+        self.draw_chrome("border", self.__draw_border)
 
     def get_width(self):
         return self.img_width
 
+    @classmethod
+    def get_role_label_height(cls):
+        return 2 * cls.role_label_padding + FontSize.function_label
+
+    @classmethod
+    def calculate_width(cls, height):
+        """
+        :return: width of the block (and image) for the given block height
+        """
+        return (height - cls.get_role_label_height()) * cls.img_aspect_ratio
+
     def __draw_image(self):
         assert self.img_height is not None
 
+        x, y = self.dimensions.x, self.dimensions.y + (self.dimensions.height - self.img_height)
+        if self.img is None:  # placeholder is shared by all cards of the document
+            AssetRegistry.for_canvas(self.context.c).draw(self.placeholder_path, x, y, self.img_width, self.img_height)
+            return
+
         self.context.c.drawImage(self.img,
-                                 self.dimensions.x,
-                                 self.dimensions.y + (self.dimensions.height - self.img_height),
+                                 x,
+                                 y,
                                  width=self.img_width,
                                  height=self.img_height,
                                  mask="auto",
-                                 preserveAspectRatio=True if self.img_url else False)
+                                 preserveAspectRatio=True)
 
     def __write_role(self):
         self.context.c.setFillColor(colors.black)
         self.context.c.setFont(self.font, FontSize.function_label)
-        str_width = stringWidth(self.context.person.function, self.font, FontSize.function_label)
+        str_width = TextMetrics.string_width(self.context.person.function, self.font, FontSize.function_label)
         self.context.c.drawString(self.dimensions.x + (self.img_width - str_width) / 2,
                                   self.dimensions.y + (
                                           self.dimensions.height - self.img_height - int(FontSize.function_label) + 1) / 2,
                                   self.context.person.function)
 
     def __draw_border(self):
+        self.context.c.setStrokeColor(colors.black)
         self.context.c.line(self.right_edge, self.dimensions.y, self.right_edge,
                             self.dimensions.y + self.dimensions.height)
         self.context.c.line(self.dimensions.x, self.dimensions.y + (self.dimensions.height - self.img_height),
                             self.right_edge, self.dimensions.y + (self.dimensions.height - self.img_height))
 
     def __get_image(self):
+        """
+        :return: image of the person or None if the placeholder has to be drawn
+        """
         if self.img_url:
             return self.__get_image_from_url()
 
         if not os.path.exists(self.placeholder_path):
             raise ValueError("Path for placeholder image not found")
-        return ImageReader(self.placeholder_path)
+        return None
 
     def __get_image_from_url(self):
+        """
+        :return: photo of the person or None if it could not be fetched
+        """
         assert self.context.person.personnel_nr is not None, "Function can only be called if person has an personnel id!"
 
-        response = requests.get(self.img_url)
-        response.raise_for_status()
-
-        img_stream = BytesIO(response.content)
-        img_stream.seek(0)
-
-        return ImageReader(img_stream)
+        if self.img_url in self.context.images:  # None if the prefetch failed
+            img = self.context.images[self.img_url]
+        elif (img := self.image_cache.get(self.img_url)) is None:  # neither prefetched nor cached -> download inline
+            with Metrics.phase("fetch"), ImageFetcher(max_workers=1, cache=self.image_cache) as fetcher:
+                img = fetcher.fetch(self.img_url)
+        if img is None:  # photo could not be fetched -> placeholder
+            return None
+        return ImageNormalizer.normalize(img, self.img_width, self.img_height)
@@ -2,6 +2,7 @@ from reportlab.lib import colors
 from reportlab.pdfbase.pdfmetrics import stringWidth
 
 from src.FontSize import FontSize
+from src.Helper.TextMetrics import TextMetrics
 from src.blocks.Block import Block
 
 
@@ -54,7 +55,9 @@ class MainBlock(Block):
         txt_right_pos = self.dimensions.x + self.dimensions.width - self.padding
         txt_bottom_pos = self.dimensions.y + self.bar_max_height + 2 * self.padding
 
+        # not memoized, every card has its own personnel_nr, it would only evict the recurring labels
         str_width = stringWidth(self.context.person.personnel_nr, self.font, FontSize.personnel_nr)
+        self.context.c.setFillColor(colors.black)  # labels of the bars may have been written in white
         self.context.c.setFont(self.font, FontSize.personnel_nr)
         self.context.c.drawString(txt_right_pos - str_width,
                                   txt_bottom_pos,
@@ -66,27 +69,38 @@ class MainBlock(Block):
         self.highest_role_idx = max(roles_with_person_qualifications) if roles_with_person_qualifications else None
 
     def __draw_qualification_bars(self):
-        bar_x = self.dimensions.x + self.padding
-        bar_y = self.dimensions.y + self.padding
-        beam_width = (self.dimensions.width - 2 * self.padding) / (len(self.roles) - 1)  # do not count "TM"
-
+        # grey bars of all roles are shared by all cards, bars of the person's roles are drawn over them
+        self.draw_chrome("bars", self.__draw_grey_bars)
+        for i in range(1, self.highest_role_idx + 1):
+            self.__draw_bar(i, has_role=True)
+        for i in range(1, len(self.roles)):
+            self.__write_bar_label(i, has_role=self.highest_role_idx >= i)
+
+    def __draw_grey_bars(self):
+        self.context.c.setStrokeColor(colors.darkgrey)
+        self.context.c.setLineWidth(1)
         for i in range(1, len(self.roles)):  # starting 1 -> 'TM' is not shown in bars
-            has_role = True if self.highest_role_idx >= i else False
-
-            # draw bars
-            self.context.c.setFillColor(colors.green if has_role else colors.lightgrey)
-            self.context.c.roundRect(bar_x + (i - 1) * beam_width, bar_y, beam_width, self.bar_max_height,
-                                     radius=5, fill=1)
-
-            # write qualification label
-            self.context.c.setFillColor(colors.white if has_role else colors.black)
-            font = f"{self.font}-Bold"
-            font_size = self.bar_max_height - 2 * self.bar_font_padding
-            str_width = stringWidth(self.roles[i], font, font_size)
-            self.context.c.setFont(font, font_size)
-            self.context.c.drawString(bar_x + (i - 1) * beam_width + (beam_width - str_width) / 2,
-                                      bar_y + (self.bar_max_height - font_size) / 2 + 1,
-                                      self.roles[i])
+            self.__draw_bar(i, has_role=False)
+
+    def __beam_width(self) -> float:
+        return (self.dimensions.width - 2 * self.padding) / (len(self.roles) - 1)  # do not count "TM"
+
+    def __draw_bar(self, i: int, has_role: bool):
+        self.context.c.setFillColor(colors.green if has_role else colors.lightgrey)
+        self.context.c.roundRect(self.dimensions.x + self.padding + (i - 1) * self.__beam_width(),
+                                 self.dimensions.y + self.padding, self.__beam_width(), self.bar_max_height,
+                                 radius=5, fill=1)
+
+    def __write_bar_label(self, i: int, has_role: bool):
+        self.context.c.setFillColor(colors.white if has_role else colors.black)
+        font = f"{self.font}-Bold"
+        font_size = self.bar_max_height - 2 * self.bar_font_padding
+        str_width = TextMetrics.string_width(self.roles[i], font, font_size)
+        self.context.c.setFont(font, font_size)
+        self.context.c.drawString(self.dimensions.x + self.padding + (i - 1) * self.__beam_width()
+                                  + (self.__beam_width() - str_width) / 2,
+                                  self.dimensions.y + self.padding + (self.bar_max_height - font_size) / 2 + 1,
+                                  self.roles[i])
 
     def __draw_trainee_label(self):
         self.context.c.setFont(f"{self.font}-Bold", FontSize.first_name)
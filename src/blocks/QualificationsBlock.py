@@ -1,14 +1,15 @@
 import os
 from dataclasses import dataclass
 from enum import Enum
-from io import BytesIO
+from functools import lru_cache
 
 import qrcode
 
 from reportlab.lib import colors
-from reportlab.lib.utils import ImageReader
 
+from src.Helper.AssetRegistry import AssetRegistry
 from src.Helper.CanvasHelper import CanvasHelper
+from src.Helper.Metrics import Metrics
 from src.blocks.Block import Block
 
 
@@ -41,18 +42,27 @@ class QualificationsBlock(Block):
         self.side_length = self.dimensions.width / 2
 
     def draw(self):
+        self.draw_chrome("squares", self.__draw_empty_squares)
         self.__draw_qualifications()
         self.__draw_qr() if self.context.person.personnel_nr else None
 
+    def __draw_empty_squares(self):
+        self.context.c.setStrokeColor(colors.black)
+        for pos, _, _ in self.options.values():
+            self.context.c.rect(*self.__get_square_coords(pos), self.side_length, self.side_length, fill=0, stroke=1)
+
     def __draw_qualifications(self):
+        self.context.c.setStrokeColor(colors.black)
         for key, (pos, color, icon_file) in self.options.items():
+            if not self.context.person.qualifications[key]:
+                continue  # empty square is part of the chrome
+
             self.context.c.setFillColor(color)
-            self.context.c.setStrokeColor(colors.black)
             self.context.c.rect(*self.__get_square_coords(pos),
                                 self.side_length, self.side_length,
-                                fill=self.context.person.qualifications[key],  # fill color if person has qualification
+                                fill=True,
                                 stroke=True)
-            self.__draw_icon(icon_file, pos) if self.context.person.qualifications[key] else None
+            self.__draw_icon(icon_file, pos)
 
     def __draw_icon(self, icon_file, pos, scale=0.6, padding=1):
         if scale > 1:
@@ -76,38 +86,50 @@ class QualificationsBlock(Block):
                 scaled_x = x + self.side_length * (1 - scale) - padding
                 scaled_y += padding
 
-        self.context.c.drawImage(path,
-                                 scaled_x, scaled_y,
-                                 (self.side_length * scale) - padding, (self.side_length * scale) - padding,
-                                 preserveAspectRatio=True,
-                                 mask="auto")
+        AssetRegistry.for_canvas(self.context.c).draw(path,
+                                                      scaled_x, scaled_y,
+                                                      (self.side_length * scale) - padding,
+                                                      (self.side_length * scale) - padding,
+                                                      preserve_aspect_ratio=True)
 
     def __draw_qr(self):
-        def generate_qr_code(text):
-            qr = qrcode.QRCode(
-                version=1,
-                error_correction=qrcode.constants.ERROR_CORRECT_L,
-                box_size=10,
-                border=0,
-            )
-            qr.add_data(text)
-            qr.make(fit=True)
-
-            img = qr.make_image(fill="black", back_color="white")
-            img_stream = BytesIO()
-            img.save(img_stream, format="PNG")
-            img_stream.seek(0)
-            return ImageReader(img_stream)
-
-        qr = generate_qr_code(self.qr_base_url + self.context.person.personnel_nr)
-        mid = (self.dimensions.x + self.side_length, self.dimensions.y + self.side_length)
-        CanvasHelper.draw_rotated_image(self.context.c,
-                                        qr,
-                                        *mid,
-                                        angle=315,
-                                        side_length=self.side_length,
-                                        scale=1,
-                                        padding=3)
+        with Metrics.phase("qr"):
+            matrix = self.get_qr_matrix(self.qr_base_url + self.context.person.personnel_nr)
+            mid = (self.dimensions.x + self.side_length, self.dimensions.y + self.side_length)
+            CanvasHelper.draw_rotated_matrix(self.context.c,
+                                             matrix,
+                                             *mid,
+                                             angle=315,
+                                             side_length=self.side_length,
+                                             scale=1,
+                                             padding=3)
+
+    @staticmethod
+    def get_qr_matrix(text: str) -> tuple[tuple[bool, ...], ...]:
+        """
+        :return: modules of the QR code (rows from top to bottom)
+        """
+        size, modules = QualificationsBlock.__qr_modules(text)
+        bits = format(modules, f"0{size * size}b")
+        return tuple(tuple(bit == "1" for bit in bits[start:start + size]) for start in range(0, size * size, size))
+
+    @staticmethod
+    @lru_cache(maxsize=16384)
+    def __qr_modules(text: str) -> tuple[int, int]:
+        """
+        :return: side length of the QR code (in modules) and its modules as bits of one integer (row by row from the
+                 top), memoized per text. Packed, an entry takes about 0.25 kB instead of about 7 kB as tuples of bools,
+                 so the cache can cover large rosters
+        """
+        qr = qrcode.QRCode(
+            version=1,
+            error_correction=qrcode.constants.ERROR_CORRECT_L,
+            border=0,
+        )
+        qr.add_data(text)
+        qr.make(fit=True)
+        matrix = qr.get_matrix()
+        return len(matrix), int("".join("1" if module else "0" for row in matrix for module in row), 2)
 
     def __get_square_coords(self, pos: Positions) -> (int, int):
         """
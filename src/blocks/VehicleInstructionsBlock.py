@@ -1,32 +1,43 @@
 from reportlab.lib import colors
-from reportlab.pdfbase.pdfmetrics import stringWidth
 
 from dataclasses import dataclass
 
+from src.Helper.TextMetrics import TextMetrics
 from src.blocks.Block import Block
 
 
 @dataclass
 class VehicleInstructionsBlock(Block):
     box_padding = 2
+    box_height: float = None  # precomputed by a batch layout
+    box_y: list[float] = None  # bottom edge of each box from top to bottom, precomputed by a batch layout
 
     def __post_init__(self):
-        self.box_height = self.dimensions.height / len(self.context.person.instructions)
+        if self.box_height is None:
+            self.box_height = self.dimensions.height / len(self.context.person.instructions)
         self.font_size = self.box_height - self.box_padding
-        self.dimensions.width = self.calculate_width()
-
-    def calculate_width(self):
-        longest_vehicle_name = max(
-            [stringWidth(i.vehicle, self.font, self.font_size) for i in self.context.person.instructions])
-        return longest_vehicle_name + 2 * self.box_padding
+        if self.dimensions.width is None:  # not precomputed by a layout plan
+            self.dimensions.width = self.calculate_width([i.vehicle for i in self.context.person.instructions],
+                                                         self.dimensions.height, self.font)
+
+    @classmethod
+    def calculate_width(cls, vehicles: (str, ...), height, font):
+        """
+        :return: width needed for the longest vehicle name, if the vehicles share the given block height
+        """
+        font_size = height / len(vehicles) - cls.box_padding
+        longest_vehicle_name = max([TextMetrics.string_width(vehicle, font, font_size) for vehicle in vehicles])
+        return longest_vehicle_name + 2 * cls.box_padding
 
     def get_width(self):
         return self.dimensions.width
 
     def draw(self):
-        y_curr = self.dimensions.y + self.dimensions.height - self.box_height  # draw starting from top
+        if self.box_y is None:  # draw starting from top
+            top = self.dimensions.y + self.dimensions.height
+            self.box_y = [top - (n + 1) * self.box_height for n in range(len(self.context.person.instructions))]
 
-        for i in self.context.person.instructions:
+        for i, y_curr in zip(self.context.person.instructions, self.box_y):
             # draw (colored) box
             self.context.c.setFillColor(colors.deepskyblue)
             self.context.c.rect(self.dimensions.x,
@@ -41,5 +52,3 @@ class VehicleInstructionsBlock(Block):
             self.context.c.drawString(self.dimensions.x + self.box_padding,
                                       y_curr + self.box_padding,
                                       i.vehicle)
-
-            y_curr -= self.box_height
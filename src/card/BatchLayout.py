@@ -0,0 +1,112 @@
+import itertools
+from dataclasses import dataclass
+from typing import Iterator, Sequence
+
+import numpy as np
+
+from src.FormatClasses import Person
+from src.card.CardDimensions import CardDimensions
+from src.card.LayoutPlan import BLOCKS, CardGeometry, LayoutPlan
+
+
+@dataclass(frozen=True)
+class Sheet:
+    """
+    Sheet the cards are placed on in a grid, row by row starting at the top left corner (all in pt).
+    """
+    width: float
+    height: float
+    margin_x: float = 0  # left and right
+    margin_y: float = 0  # top and bottom
+    column_gap: float = 0
+    row_gap: float = 0
+
+    def grid(self, card_width: float, card_height: float) -> tuple[int, int]:
+        """
+        :param card_width: width of a card (in pt)
+        :param card_height: height of a card (in pt)
+        :return: number of columns and rows of cards fitting on the sheet
+        :raises ValueError: if not a single card fits between the margins
+        """
+        # a card filling the sheet exactly must not be lost to rounding
+        columns = int((self.width - 2 * self.margin_x + self.column_gap) / (card_width + self.column_gap) + 1e-9)
+        rows = int((self.height - 2 * self.margin_y + self.row_gap) / (card_height + self.row_gap) + 1e-9)
+        if columns < 1 or rows < 1:
+            raise ValueError(f"A card of {card_width:.1f}x{card_height:.1f} pt does not fit on a sheet of "
+                             f"{self.width:.1f}x{self.height:.1f} pt with margins {self.margin_x}/{self.margin_y}")
+        return columns, rows
+
+    def cards_per_page(self, card_width: float, card_height: float) -> int:
+        columns, rows = self.grid(card_width, card_height)
+        return columns * rows
+
+    def positions(self, card_width: float, card_height: float, start: int, count: int) \
+            -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        :param start: index of the first card in the document
+        :param count: number of cards
+        :return: page index and bottom left corner (x, y) of each card
+        """
+        columns, rows = self.grid(card_width, card_height)
+        page, slot = np.divmod(np.arange(start, start + count), columns * rows)
+        row, column = np.divmod(slot, columns)
+        x = self.margin_x + column * (card_width + self.column_gap)
+        y = self.height - self.margin_y - card_height - row * (card_height + self.row_gap)
+        return page, x, y
+
+
+class BatchLayout:
+    """
+    Geometry of all cards of a roster, computed at once as arrays with a row per card: page, card position, bars and
+    content (between the top and bottom bars), block x and width and the position and height of the vehicle boxes.
+    The geometry relative to the card comes from the LayoutPlan of each distinct set of vehicles, so text is measured
+    once per set and single cards (see LayoutPlan.at) are laid out the same way. Cards consume their row (see
+    CardGeometry) instead of computing their dimensions one by one.
+    """
+
+    def __init__(self, persons: Sequence[Person], sheet: Sheet, card_width, card_height, top_bottom_padding=0.0,
+                 font="Helvetica", start: int = 0):
+        """
+        :param persons: person of every card in print order
+        :param card_width: total width (in mm)
+        :param card_height: total height (in mm)
+        :param top_bottom_padding: top and bottom bars for old cardholder (in mm)
+        :param start: index of the first card in the document, e.g. for cards laid out in batches
+        """
+        dimensions = CardDimensions(0, 0, card_width, card_height, top_bottom_padding)
+        self.width, self.height = dimensions.width, dimensions.height
+        self.bar_height, self.content_height = dimensions.bar_height, dimensions.content_height
+
+        self.page, self.x, self.y = sheet.positions(self.width, self.height, start, len(persons))
+        self.content_y = self.y + dimensions.content_y
+
+        # relative geometry per distinct set of vehicles
+        structures: dict[tuple[str, ...], int] = {}
+        structure = np.fromiter((structures.setdefault(tuple(i.vehicle for i in person.instructions), len(structures))
+                                 for person in persons), dtype=np.intp, count=len(persons))
+        plans = [LayoutPlan.get(card_width, card_height, top_bottom_padding, font, vehicles) for vehicles in structures]
+        block_x = np.array([[block.x for _, block in plan.blocks] for plan in plans]).reshape(len(plans), len(BLOCKS))
+        block_width = np.array([[block.width for _, block in plan.blocks]
+                                for plan in plans]).reshape(len(plans), len(BLOCKS))
+        box_count = np.array([len(plan.box_y) for plan in plans], dtype=np.intp)
+        box_y = np.full((len(plans), box_count.max(initial=0)), np.nan)  # padded beyond the vehicles of a card
+        for idx, plan in enumerate(plans):
+            box_y[idx, :len(plan.box_y)] = plan.box_y
+
+        # placed at the position of every card
+        self.block_width = block_width[structure]
+        self.block_x = self.x[:, None] + block_x[structure]
+        self.box_count = box_count[structure]
+        self.box_y = self.y[:, None] + box_y[structure]
+        self.box_height = np.array([plan.box_height for plan in plans])[structure]
+
+    def __len__(self):
+        return len(self.page)
+
+    def __iter__(self) -> Iterator[CardGeometry]:
+        constant = itertools.repeat
+        box_y = (box_y[:count] for box_y, count in zip(self.box_y.tolist(), self.box_count.tolist()))
+        return map(CardGeometry._make, zip(self.page.tolist(), self.x.tolist(), self.y.tolist(), constant(self.width),
+                                           constant(self.height), constant(self.bar_height), self.content_y.tolist(),
+                                           constant(self.content_height), self.block_x.tolist(),
+                                           self.block_width.tolist(), box_y, self.box_height.tolist()))
@@ -1,10 +1,13 @@
 from reportlab.lib import colors
+from reportlab.lib.utils import ImageReader
 from reportlab.pdfgen import canvas
 
 from src.FormatClasses import *
+from src.Helper.FormRegistry import FormRegistry
+from src.Helper.Metrics import Metrics
 from src.blocks import *
 from src.card.CardContext import CardContext
-from src.card.CardDimensions import CardDimensions
+from src.card.LayoutPlan import BLOCKS, CardGeometry, LayoutPlan
 
 
 class Card:
@@ -20,70 +23,53 @@ class Card:
     """
 
     def __init__(self, canvas: canvas, person: Person, card_x, card_y, card_width, card_height, top_bottom_padding=0.0,
-                 font="Helvetica"):
+                 font="Helvetica", images: dict[str, ImageReader] = None, geometry: CardGeometry = None):
         """
         :param person: JSON data for a single person
         :param card_width: total width (in mm)
         :param card_height: total height (in mm)
         :param top_bottom_padding: top and bottom bars for old cardholder (in mm)
+        :param images: prefetched images by url (None if it could not be fetched -> placeholder), images missing
+                       here are downloaded while building the card
+        :param geometry: row of a BatchLayout of the whole roster, replaces card_x, card_y, the card size and the
+                         layout plan of the single card, which is placed the same way (see LayoutPlan.at)
         """
 
-        self.context = CardContext(canvas, person)
-        self.dimensions = CardDimensions(card_x, card_y, card_width, card_height,
-                                         top_bottom_padding)
-        self.content_dimensions = self.dimensions.get_content_dimensions()
-
+        self.context = CardContext(canvas, person, images)
         self.font = font
+        block_classes = {"image": ImageBlock,
+                         "main_content": MainBlock,
+                         "vehicle_instructions": VehicleInstructionsBlock,
+                         "other_qualifications": QualificationsBlock}
+        if geometry is None:
+            with Metrics.phase("layout"):
+                layout_plan = LayoutPlan.get(card_width, card_height, top_bottom_padding, font,
+                                             tuple(i.vehicle for i in person.instructions))
+                geometry = layout_plan.at(card_x, card_y)
+
+        self.dimensions = Dimensions(geometry.x, geometry.y, geometry.width, geometry.height)
+        self.content_dimensions = Dimensions(geometry.x, geometry.content_y, geometry.width, geometry.content_height)
+        self.chrome_key = (geometry.width, geometry.height, geometry.bar_height, geometry.content_height)
+        block_args = {"vehicle_instructions": {"box_y": geometry.box_y, "box_height": geometry.box_height}}
         self.blocks = {
-            "image":
-                ImageBlock(self.context,
-                           Dimensions(self.content_dimensions.x,
-                                      self.content_dimensions.y,
-                                      None,
-                                      self.content_dimensions.height)),
-            "main_content":
-                MainBlock(self.context,
-                          Dimensions(None,
-                                     self.content_dimensions.y,
-                                     None,
-                                     self.content_dimensions.height)),
-            "vehicle_instructions":
-                VehicleInstructionsBlock(self.context,
-                                         Dimensions(None,
-                                                    self.content_dimensions.y,
-                                                    None,
-                                                    self.content_dimensions.height)),
-            "other_qualifications":
-                QualificationsBlock(self.context,
-                                    Dimensions(
-                                        self.content_dimensions.x + self.dimensions.width - self.content_dimensions.height,
-                                        self.content_dimensions.y,
-                                        self.content_dimensions.height,
-                                        self.content_dimensions.height))
+            name: block_classes[name](self.context,
+                                      Dimensions(x, geometry.content_y, block_width, geometry.content_height),
+                                      font=font, **block_args.get(name, {}))
+            for name, x, block_width in zip(BLOCKS, geometry.block_x, geometry.block_width)
         }
 
     def draw(self):
-        # calculate remaining block dimension parameters
-        current_width = sum([block.get_width() for block in self.blocks.values() if block.get_width()])
-        blocks_without_width = [key for key, block in self.blocks.items() if block.get_width() is None]
-
-        # spread remaining card space equally across blocks without width
-        remaining_space = self.content_dimensions.width - current_width
-        for key in blocks_without_width:
-            self.blocks[key].dimensions.width = remaining_space / len(blocks_without_width)
-
-        assert all([block.get_width() for block in
-                    self.blocks.values()]), "Something went wrong, not all blocks do have a width!"
-
-        # set new x for every block
-        blocks = list(self.blocks.values())
-        for i in range(len(blocks) - 1):
-            blocks[i + 1].set_x(blocks[i].right_edge)
-
-        for block in self.blocks.values():
-            block.draw()
+        with Metrics.phase("draw"):
+            # block geometry is precomputed by the layout plan or the batch layout
+            for block in self.blocks.values():
+                block.draw()
 
-        self.__draw_main_borders()
+            FormRegistry.for_canvas(self.context.c).draw(
+                ("Card", "borders", *self.chrome_key),
+                self.dimensions.x, self.dimensions.y, self.dimensions.width, self.dimensions.height,
+                self.__draw_main_borders)
+            self.context.c.flush()  # the page is finished on the wrapped canvas
+        Metrics.count("cards")
 
     def __draw_main_borders(self):
         c = self.context.c
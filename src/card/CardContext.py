@@ -1,9 +1,15 @@
+from reportlab.lib.utils import ImageReader
 from reportlab.pdfgen import canvas
 
 from src.FormatClasses import Person
+from src.Helper.StateCanvas import StateCanvas
 
 
 class CardContext:
-    def __init__(self, canvas: canvas, person: Person):
-        self.c = canvas
+    def __init__(self, canvas: canvas, person: Person, images: dict[str, ImageReader] = None):
+        """
+        :param images: prefetched images by url (see ImageFetcher.prefetch)
+        """
+        self.c = StateCanvas.wrap(canvas)  # skips redundant state changes, shared by all cards of the canvas
         self.person = person
+        self.images = images if images is not None else {}
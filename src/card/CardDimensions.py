@@ -1,15 +1,18 @@
 from src.FormatClasses import Dimensions
 
+MM_TO_PT = 2.834
+
 
 class CardDimensions:
     def __init__(self, x, y, card_width, card_height,
                  top_bottom_padding):
         self.x = x
         self.y = y
-        self.content_y = self.y + top_bottom_padding * 2.834
-        self.width = card_width * 2.834  # mm to pt
-        self.height = card_height * 2.834
-        self.content_height = (card_height - 2 * top_bottom_padding) * 2.834
+        self.bar_height = top_bottom_padding * MM_TO_PT
+        self.content_y = self.y + self.bar_height
+        self.width = card_width * MM_TO_PT
+        self.height = card_height * MM_TO_PT
+        self.content_height = (card_height - 2 * top_bottom_padding) * MM_TO_PT
 
     def get_content_dimensions(self):
         return Dimensions(self.x, self.content_y, self.width, self.content_height)
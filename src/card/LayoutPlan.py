@@ -0,0 +1,98 @@
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import NamedTuple
+
+from src.blocks import ImageBlock, VehicleInstructionsBlock
+from src.card.CardDimensions import CardDimensions
+
+BLOCKS = ("image", "main_content", "vehicle_instructions", "other_qualifications")  # from left to right
+
+
+@dataclass(frozen=True)
+class BlockGeometry:
+    x: float  # relative to the left edge of the card (in pt)
+    width: float
+
+
+class CardGeometry(NamedTuple):
+    """
+    Geometry of a placed card (in pt), see LayoutPlan.at for a single card and BatchLayout for a whole roster.
+    """
+    page: int
+    x: float  # bottom left corner of the card
+    y: float
+    width: float
+    height: float
+    bar_height: float  # of the top and the bottom bar
+    content_y: float  # bottom edge of the content between the top and bottom bars
+    content_height: float
+    block_x: list[float]  # of the blocks in the order of BLOCKS
+    block_width: list[float]
+    box_y: list[float]  # bottom edge of each vehicle box, from top to bottom
+    box_height: float  # height of each vehicle box
+
+
+@dataclass(frozen=True)
+class LayoutPlan:
+    """
+    Geometry of all blocks of a card, relative to the card position. Cards of the same structure (card size,
+    padding, font and vehicle names) share one plan, so the layout math is done once per structure. It is the only
+    place the layout of a card is computed, a single card is placed by at and whole rosters by BatchLayout.
+    """
+    width: float
+    height: float
+    bar_height: float
+    content_y: float  # relative to the bottom edge of the card
+    content_height: float
+    blocks: tuple[tuple[str, BlockGeometry], ...]  # in the order of BLOCKS
+    box_y: tuple[float, ...]  # bottom edge of each vehicle box from top to bottom, relative to the bottom edge
+    box_height: float
+
+    def block(self, name: str) -> BlockGeometry:
+        return dict(self.blocks)[name]
+
+    def at(self, x: float, y: float, page: int = 0) -> CardGeometry:
+        """
+        :return: geometry of the card with its bottom left corner at (x, y)
+        """
+        return CardGeometry(page, x, y, self.width, self.height, self.bar_height, y + self.content_y,
+                            self.content_height, [x + block.x for _, block in self.blocks],
+                            [block.width for _, block in self.blocks], [y + box_y for box_y in self.box_y],
+                            self.box_height)
+
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def get(card_width, card_height, top_bottom_padding, font: str, vehicles: tuple[str, ...]) -> "LayoutPlan":
+        """
+        :param card_width: total width (in mm)
+        :param card_height: total height (in mm)
+        :param top_bottom_padding: top and bottom bars for old cardholder (in mm)
+        :param vehicles: vehicle names of the person's instructions
+        """
+        dimensions = CardDimensions(0, 0, card_width, card_height, top_bottom_padding)
+        content = dimensions.get_content_dimensions()
+
+        widths = {"image": ImageBlock.calculate_width(content.height),
+                  "main_content": None,
+                  "vehicle_instructions": VehicleInstructionsBlock.calculate_width(vehicles, content.height, font),
+                  "other_qualifications": content.height}
+
+        # spread remaining card space equally across blocks without width
+        blocks_without_width = [key for key, width in widths.items() if width is None]
+        remaining_space = content.width - sum(width for width in widths.values() if width)
+        for key in blocks_without_width:
+            widths[key] = remaining_space / len(blocks_without_width)
+
+        # chain blocks from left to right
+        blocks = []
+        x = content.x
+        for key, width in widths.items():
+            blocks.append((key, BlockGeometry(x, width)))
+            x += width
+
+        # vehicle boxes share the content height, stacked from its top
+        box_height = content.height / len(vehicles)
+        box_y = tuple(content.y + content.height - (i + 1) * box_height for i in range(len(vehicles)))
+
+        return LayoutPlan(dimensions.width, dimensions.height, dimensions.bar_height, dimensions.content_y, content.height,
+                          tuple(blocks), box_y, box_height)
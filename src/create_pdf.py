@@ -1,11 +1,29 @@
-from typing import Literal
+import gc
+import itertools
+import math
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import BinaryIO, Callable, Iterable, Iterator, Literal, Optional, Union
 
 
-from pydantic import BaseModel
 from reportlab.lib.pagesizes import landscape, A4
+from reportlab.lib.utils import ImageReader
 from reportlab.pdfgen import canvas
 
-from src.FormatClasses import Person
+from src.FormatClasses import PdfRequest, Person, RenderReport, Selection
+from src.Helper.CardCache import CardCache
+from src.Helper.ChunkBuffer import ChunkBuffer
+from src.Helper.FormFragment import FormFragment
+from src.Helper.FormRegistry import FormRegistry
+from src.Helper.ImageCache import ImageCache
+from src.Helper.ImageFetcher import ImageFetcher
+from src.Helper.Metrics import Metrics
+from src.blocks import ImageBlock
+from src.card.BatchLayout import BatchLayout, Sheet
+from src.card.CardDimensions import MM_TO_PT
+from src.card.LayoutPlan import CardGeometry
 from src.card.Card import Card
 
 
@@ -16,40 +34,471 @@ GRID_MARGIN_Y = 0
 CARD_WIDTH = 100  # mm
 CARD_HEIGHT = 22.45  # mm
 TOP_BOTTOM_PADDING = 1.725  # mm
+LABEL_PAGE_SIZE = (CARD_WIDTH * MM_TO_PT, CARD_HEIGHT * MM_TO_PT)
+SHEETS = {"A4": Sheet(PAGE_WIDTH, PAGE_HEIGHT, margin_x=EDGE_MARGIN, margin_y=EDGE_MARGIN, row_gap=GRID_MARGIN_Y),
+          "Label": Sheet(*LABEL_PAGE_SIZE)}  # a Label page holds a single card
+IMAGE_FETCH_CONCURRENCY = 8
+RENDER_WORKERS = 1  # > 1 renders Label pages in parallel worker processes
+LABEL_CHUNK_SIZE = 25
+CARD_FRAGMENT_MARGIN = 2  # pt around a cached card, so its border lines are not clipped by the fragment
+STREAM_GROUP_SIZE = 8  # cards rendered and written at once when streaming, later groups grow up to
+STREAM_MAX_GROUP_SIZE = 128  # ... this many cards
+CANVAS_CARD_MEMORY = 8 * 1024  # approximate memory of the drawn content of a card, held by a canvas until it is saved
+CANVAS_OBJECT_OVERHEAD = 3 * 1024  # approximate memory of an image held by a canvas, besides its data
 
-class PdfRequest(BaseModel):
-    title: str
-    persons: list[Person]
+def create_pdf(data: PdfRequest, paper_size: Literal["A4", "Label"], output: Union[str, BinaryIO],
+               image_fetch_concurrency: int = IMAGE_FETCH_CONCURRENCY, report: RenderReport = None,
+               workers: int = RENDER_WORKERS, chunk_size: int = LABEL_CHUNK_SIZE,
+               progress: Optional[Callable[[int, int], None]] = None, card_cache: CardCache = None,
+               memory_limit: Optional[int] = None, selection: Selection = None, sheet: Sheet = None):
+    """
+    :param output: filename (written to the working directory) or a writable binary stream, e.g. an in-memory buffer
+    :param report: optional report that is filled with statistics about the rendered document
+    :param workers: number of worker processes rendering Label pages in parallel (1 renders sequentially)
+    :param chunk_size: number of Label pages rendered per worker task
+    :param progress: called with (rendered cards, total cards) while rendering, copies count as cards
+    :param card_cache: optional cache of rendered cards, enables the incremental mode: only persons without a cached
+                       card are rendered, the document is assembled from the cached cards
+    :param memory_limit: enables the bounded-memory mode: pages are flushed to disk and stitched into the document
+                         before the pages and images held in memory exceed roughly this size (in bytes), so peak
+                         memory does not grow with the roster. Takes precedence over card_cache and workers.
+    :param selection: optional subset of the roster, only the selected persons are fetched and rendered (on A4 packed
+                      onto as few sheets as possible)
+    :param sheet: sheet the cards are placed on, replaces the sheet of the paper size (see SHEETS), e.g. for other
+                  margins or label sheets holding several cards
+    :return: path of the written file or the given stream
+    :raises ValueError: if the selection does not match the roster or a card does not fit on the sheet
+    """
+    sheet = sheet or SHEETS[paper_size]
+    if selection is not None:
+        data = data.model_copy(update={"persons": select_persons(data.persons, paper_size, selection, sheet)})
 
+    pdf_path = f"./{output}" if isinstance(output, str) else output
+    start_offset = output.tell() if not isinstance(output, str) else 0
 
-def create_pdf(data: PdfRequest, paper_size: Literal["A4", "Label"], filename=str):
-    pdf_path = f"./{filename}"
+    if memory_limit is not None:
+        deduplicated_bytes, placeholders = _create_pdf_bounded(data.persons, sheet, pdf_path, memory_limit,
+                                                               image_fetch_concurrency, progress)
+        _count_written(pdf_path, start_offset)
+        if report is not None:
+            report.deduplicated_bytes = deduplicated_bytes
+            report.placeholders = placeholders
+        return pdf_path
 
-    if paper_size == "A4":
-        c = canvas.Canvas(pdf_path, pagesize=landscape(A4))
+    if card_cache is not None:
+        cards_reused, placeholders = _create_pdf_incremental(data.persons, sheet, pdf_path, card_cache,
+                                                             image_fetch_concurrency, progress)
+        _count_written(pdf_path, start_offset)
+        if report is not None:
+            report.cards_reused = cards_reused
+            report.placeholders = placeholders
+        return pdf_path
 
-        x_offset = EDGE_MARGIN
-        y_offset = PAGE_HEIGHT - CARD_HEIGHT * 2.834 - EDGE_MARGIN
-        for idx, person in enumerate(data.persons):
-            if y_offset < EDGE_MARGIN:
-                c.showPage()
-                x_offset = EDGE_MARGIN
-                y_offset = PAGE_HEIGHT - CARD_HEIGHT * 2.834 - EDGE_MARGIN
+    # download all photos concurrently before drawing any card
+    with Metrics.phase("fetch"), ImageFetcher(max_workers=image_fetch_concurrency,
+                                              cache=ImageBlock.image_cache) as fetcher:
+        images = fetcher.prefetch(person.image_url for person in data.persons)
 
-            card = Card(c, person, x_offset, y_offset, CARD_WIDTH, CARD_HEIGHT, TOP_BOTTOM_PADDING)
-            card.draw()
+    cards = _cards(data.persons)
+    if paper_size == "Label" and workers > 1 and len(cards) > chunk_size:
+        failed_urls = {url for url, image in images.items() if image is None}
+        deduplicated_bytes = _create_label_pdf_parallel(cards, sheet, pdf_path, image_fetch_concurrency, workers,
+                                                        chunk_size, failed_urls, progress)
+    else:
+        c = canvas.Canvas(pdf_path, pagesize=(sheet.width, sheet.height))
+        _draw_pages(c, cards, images, sheet, progress)
+
+        deduplicated_bytes = 0  # reportlab embeds every image and form once per document anyway
+        with Metrics.phase("save"):
+            c.save()
+
+    _count_written(pdf_path, start_offset)
+    if report is not None:
+        report.deduplicated_bytes = deduplicated_bytes
+        report.placeholders = _placeholders(data.persons, images)
+    return pdf_path
+
+
+def create_pdf_stream(persons: Iterable[Person], paper_size: Literal["A4", "Label"],
+                      image_fetch_concurrency: int = IMAGE_FETCH_CONCURRENCY, group_size: int = STREAM_GROUP_SIZE,
+                      max_group_size: int = STREAM_MAX_GROUP_SIZE, report: RenderReport = None,
+                      sheet: Sheet = None) -> Iterator[bytes]:
+    """
+    Renders the persons while they are read (e.g. by RosterReader) and yields the document in chunks. Every group of
+    cards is rendered on its own canvas as soon as its cards are read and stitched to the output, so neither the
+    roster nor the document is held in memory.
+    Every group pays for its canvas: icons and card chrome are embedded again (the stitcher writes them only once) and
+    the stitcher parses the group, about 40 ms per group (see the *-stream modes of benchmarks/bench_render.py). So
+    the first group is small to send the first bytes early and the following ones double in size.
+    :param persons: persons in order, consumed lazily
+    :param group_size: cards of the first group, rounded up to whole pages
+    :param max_group_size: cards of a group at most, rounded up to whole pages
+    :param report: optional report that is filled with statistics once the document is complete
+    :param sheet: sheet the cards are placed on, replaces the sheet of the paper size (see SHEETS)
+    :return: iterator of the document's bytes, the document is complete once it is exhausted
+    """
+    from src.Helper.PdfStitcher import PdfStitcher  # imported lazily, pypdf is only needed to stitch documents
+
+    sheet = sheet or SHEETS[paper_size]
+    page_cards = sheet.cards_per_page(*LABEL_PAGE_SIZE)  # a group starts a new page
+
+    cards = ((person, copy) for person in persons for copy in range(person.copies))
+    output = ChunkBuffer()
+    stitcher = PdfStitcher(output)
+    placeholders = []
+    with ImageFetcher(max_workers=image_fetch_concurrency, cache=ImageBlock.image_cache) as fetcher:
+        while group := list(itertools.islice(cards, math.ceil(group_size / page_cards) * page_cards)):
+            group_size = min(2 * group_size, max_group_size)
+            with Metrics.phase("fetch"):
+                images = fetcher.prefetch(person.image_url for person, _ in group)
+            placeholders += _placeholders([person for person, copy in group if copy == 0], images)
+            group = [person for person, _ in group]
+
+            buffer = BytesIO()
+            c = canvas.Canvas(buffer, pagesize=(sheet.width, sheet.height))
+            _draw_pages(c, group, images, sheet)
+            with Metrics.phase("save"):
+                c.save()
+
+            with Metrics.phase("stitch"):
+                stitcher.add_document(buffer.getvalue())
+            yield output.drain()
+
+    stitcher.close()
+    yield output.drain()
+
+    if Metrics.enabled():
+        Metrics.count("bytes_written", output.tell())
+        Metrics.count("documents")
+    if report is not None:
+        report.deduplicated_bytes = stitcher.deduplicated_bytes
+        report.placeholders = placeholders
+
+
+def select_persons(persons: list[Person], paper_size: Literal["A4", "Label"], selection: Selection,
+                   sheet: Sheet = None) -> list[Person]:
+    """
+    :param sheet: sheet the cards are placed on, replaces the sheet of the paper size (see SHEETS)
+    :return: selected persons in roster order, pages of the selection refer to the document of the whole roster
+    :raises ValueError: if the selection does not match the roster
+    """
+    sheet = sheet or SHEETS[paper_size]
+    card_pages, _, _ = sheet.positions(*LABEL_PAGE_SIZE, 0, sum(person.copies for person in persons))
+    card_pages = card_pages.tolist()
+    last_cards = list(itertools.accumulate(person.copies for person in persons))
+    pages = [(card_pages[last - person.copies], card_pages[last - 1]) for person, last in zip(persons, last_cards)]
+    return selection.select(persons, pages)
+
+
+def _create_pdf_bounded(persons: list[Person], sheet: Sheet, output: Union[str, BinaryIO],
+                        memory_limit: int, image_fetch_concurrency: int,
+                        progress: Optional[Callable[[int, int], None]] = None) -> tuple[int, list[str]]:
+    """
+    Draws the pages on a canvas backed by a temporary file. Whenever a page is complete and the cards and photos held
+    by the canvas (estimated by _card_memory, plus stitching them) would exceed memory_limit, the canvas is saved and
+    stitched to the output and drawing continues on a new one. Photos are fetched in batches through a cache sharing
+    the disk tier of ImageBlock.image_cache but without memory tier, so only the photos of the current batch are held
+    in memory.
+    :return: deduplicated bytes of the document and personnel_nr of the persons drawn with the placeholder
+    """
+    from src.Helper.PdfStitcher import PdfStitcher  # imported lazily, pypdf is only needed to stitch documents
 
-            x_offset += CARD_WIDTH * 2.834
-            if x_offset + CARD_WIDTH * 2.834 > PAGE_WIDTH - EDGE_MARGIN:
-                x_offset = EDGE_MARGIN
-                y_offset -= CARD_HEIGHT * 2.834 + GRID_MARGIN_Y  # next line
+    shared_cache = ImageBlock.image_cache
+    cache = ImageCache(cache_dir=shared_cache.cache_dir, max_disk_bytes=shared_cache.max_disk_bytes,
+                       max_memory_items=0, max_age=shared_cache.max_age)
+
+    out = open(output, "wb") if isinstance(output, str) else output
+    try:
+        with ImageFetcher(max_workers=image_fetch_concurrency, cache=cache) as fetcher, PdfStitcher(out) as stitcher:
+            c, group_file, current_page = None, None, None
+            held, drawn_photos = 0, set()  # of the current canvas
+            placeholders = []
+            rendered, total = 0, sum(person.copies for person in persons)
+            for start in range(0, len(persons), image_fetch_concurrency):
+                batch = persons[start:start + image_fetch_concurrency]
+                with Metrics.phase("fetch"):
+                    images = fetcher.prefetch(person.image_url for person in batch)
+                placeholders += _placeholders(batch, images)
+
+                cards = _cards(batch)
+                for person, geometry in zip(cards, _layout(cards, sheet, start=rendered)):
+                    if geometry.page != current_page:
+                        # stitching parses the saved group, which takes about as much memory again
+                        if c is not None and 2 * held >= memory_limit:
+                            _flush_page_group(c, group_file, stitcher)
+                            c = None
+                        if c is None:
+                            group_file = tempfile.TemporaryFile()
+                            c = canvas.Canvas(group_file, pagesize=(sheet.width, sheet.height))
+                            held, drawn_photos = 0, set()
+                        elif current_page is not None:
+                            c.showPage()
+                        current_page = geometry.page
+
+                    _draw_card(c, person, geometry, images)
+                    held += _card_memory(person, images, drawn_photos)
+                    rendered += 1
+                    if progress:
+                        progress(rendered, total)
+
+                _release_photos(images)
+
+            if c is not None:
+                _flush_page_group(c, group_file, stitcher)
+        return stitcher.deduplicated_bytes, placeholders
+    finally:
+        if isinstance(output, str):
+            out.close()
+
+
+def _placeholders(persons: Iterable[Person], images: dict[str, Optional[ImageReader]]) -> list[str]:
+    """
+    :param images: prefetched images, None for photos that could not be fetched
+    :return: personnel_nr of the persons whose photo could not be fetched, their cards show the placeholder
+    """
+    return [person.personnel_nr for person in persons
+            if person.image_url in images and images[person.image_url] is None]
+
+
+def _release_photos(images: dict[str, Optional[ImageReader]]):
+    """
+    Lets the decoded photos be freed as soon as they are no longer referenced. reportlab's ImageReader of a JPEG
+    references itself through its private jpeg_fh attribute, so it would otherwise wait for the cycle collector, which
+    runs far less often than photos are decoded. This is the one reportlab internal the bounded mode relies on: without
+    it the peak grows by about half, collecting the cycles after every batch instead costs about 40% more time. If a
+    reportlab version drops the attribute, nothing is popped and the readers are collected later. The readers must not
+    be drawn afterwards.
+    """
+    for reader in filter(None, images.values()):
+        vars(reader).pop("jpeg_fh", None)
+
+
+def _card_memory(person: Person, images: dict[str, Optional[ImageReader]], drawn_photos: set[str]) -> int:
+    """
+    :param drawn_photos: urls of the photos drawn on the canvas before, the person's photo is added. reportlab embeds
+                         every photo once per document
+    :return: approximate memory the canvas holds for the drawn card until it is saved: its page content and, if it is
+             drawn first, its photo. The photo is counted by its encoded size (plus ASCII85, as reportlab embeds it),
+             an upper bound of the resampled photo that is actually embedded
+    """
+    memory = CANVAS_CARD_MEMORY
+    photo = images.get(person.image_url)
+    if photo is not None and person.image_url not in drawn_photos and isinstance(photo.fp, BytesIO):
+        drawn_photos.add(person.image_url)
+        with photo.fp.getbuffer() as data:
+            memory += data.nbytes * 5 // 4 + CANVAS_OBJECT_OVERHEAD
+    return memory
+
+
+def _flush_page_group(c: canvas.Canvas, group_file: BinaryIO, stitcher):
+    """
+    Saves the canvas to its file and appends its pages to the stitched document. The parsed group references itself
+    (pypdf's reader and its objects), it is freed right away instead of piling up until the cycle collector runs.
+    """
+    with Metrics.phase("save"):
         c.save()
-    else:
-        c = canvas.Canvas(pdf_path, pagesize=(CARD_WIDTH * 2.834, CARD_HEIGHT * 2.834))
-        for idx, person in enumerate(data.persons):
-            card = Card(c, person, 0, 0, CARD_WIDTH, CARD_HEIGHT, TOP_BOTTOM_PADDING)
-            card.draw()
+    with group_file, Metrics.phase("stitch"):
+        group_file.seek(0)
+        stitcher.add_document(group_file)
+        gc.collect()
+
+
+def _count_written(output: Union[str, BinaryIO], start_offset: int):
+    if Metrics.enabled():
+        written = os.path.getsize(output) if isinstance(output, str) else output.tell() - start_offset
+        Metrics.count("bytes_written", written)
+        Metrics.count("documents")
+
+
+def _cards(persons: list[Person]) -> list[Person]:
+    """
+    :return: person of every card in print order, a person printed in several copies is repeated
+    """
+    return [person for person in persons for _ in range(person.copies)]
+
+
+def _layout(cards: list[Person], sheet: Sheet, start: int = 0) -> BatchLayout:
+    """
+    :param start: index of the first card in the document
+    :return: geometry of the cards on the sheets
+    """
+    with Metrics.phase("layout"):
+        return BatchLayout(cards, sheet, CARD_WIDTH, CARD_HEIGHT, TOP_BOTTOM_PADDING, start=start)
+
+
+def _draw_card(c: canvas.Canvas, person: Person, geometry: CardGeometry, images: dict[str, ImageReader]):
+    """
+    Draws the card of the person. A card printed in several copies is drawn (and its photo and QR code built) only
+    once per canvas as form XObject, every copy just places the form.
+    """
+    if person.copies == 1:
+        Card(c, person, geometry.x, geometry.y, CARD_WIDTH, CARD_HEIGHT, TOP_BOTTOM_PADDING, images=images,
+             geometry=geometry).draw()
+        return
+
+    def draw_content():
+        Card(c, person, geometry.x, geometry.y, CARD_WIDTH, CARD_HEIGHT, TOP_BOTTOM_PADDING, images=images,
+             geometry=geometry).draw()
+
+    # the copies of a person are the same object, also within the chunks of worker processes
+    FormRegistry.for_canvas(c).draw(("Card", id(person)), geometry.x, geometry.y, *LABEL_PAGE_SIZE, draw_content)
+
+
+def _draw_pages(c: canvas.Canvas, cards: list[Person], images: dict[str, ImageReader], sheet: Sheet,
+                progress: Optional[Callable[[int, int], None]] = None):
+    """
+    Draws the cards page by page, the last page is finished by saving the canvas.
+    """
+    current_page = 0
+    for idx, (person, geometry) in enumerate(zip(cards, _layout(cards, sheet))):
+        if geometry.page != current_page:
             c.showPage()
-        c.save()
-    return pdf_path
+            current_page = geometry.page
+
+        _draw_card(c, person, geometry, images)
+        if progress:
+            progress(idx + 1, len(cards))
+
+
+def _create_label_pdf_parallel(cards: list[Person], sheet: Sheet, output: Union[str, BinaryIO],
+                               image_fetch_concurrency: int,
+                               workers: int, chunk_size: int, failed_urls: set[str],
+                               progress: Optional[Callable[[int, int], None]] = None) -> int:
+    """
+    Renders chunks of Label pages in worker processes, each with its own canvas, and stitches them in order.
+    Photos were prefetched into the disk cache before, so the workers do not hit the network again. Photos that
+    could not be fetched (failed_urls) are not requested again, their cards get the placeholder.
+    Metrics of the workers are merged into the current ones, their phases add up the time of all workers.
+    :param chunk_size: cards per chunk, rounded up to whole pages as every chunk starts a new page
+    :return: bytes of the objects shared by several chunks that were written only once
+    """
+    from src.Helper.PdfStitcher import PdfStitcher  # imported lazily, pypdf is only needed to stitch documents
 
+    page_cards = sheet.cards_per_page(*LABEL_PAGE_SIZE)
+    chunk_size = math.ceil(chunk_size / page_cards) * page_cards
+    chunks = [cards[i:i + chunk_size] for i in range(0, len(cards), chunk_size)]
+
+    out = open(output, "wb") if isinstance(output, str) else output
+    try:
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as executor, PdfStitcher(out) as stitcher:
+            for chunk_pdf, chunk_metrics in executor.map(
+                    _render_label_chunk, chunks, [sheet] * len(chunks), [image_fetch_concurrency] * len(chunks),
+                    [failed_urls] * len(chunks), [Metrics.enabled()] * len(chunks)):
+                with Metrics.phase("stitch"):
+                    stitcher.add_document(chunk_pdf)
+                if chunk_metrics:
+                    Metrics.current().merge(chunk_metrics)
+                if progress:
+                    progress(stitcher.page_count, len(cards))
+    finally:
+        if isinstance(output, str):
+            out.close()
+    return stitcher.deduplicated_bytes
+
+
+def _render_label_chunk(cards: list[Person], sheet: Sheet, image_fetch_concurrency: int, failed_urls: set[str],
+                        record_metrics: bool = False) -> tuple[bytes, Optional[dict]]:
+    """
+    Worker task of the parallel Label mode.
+    :param record_metrics: True records the metrics of the chunk
+    :return: rendered chunk and the snapshot of its metrics (if recorded)
+    """
+    with Metrics.record(record_metrics) as metrics:
+        with Metrics.phase("fetch"), ImageFetcher(max_workers=image_fetch_concurrency,
+                                                  cache=ImageBlock.image_cache) as fetcher:
+            images = fetcher.prefetch(person.image_url for person in cards if person.image_url not in failed_urls)
+        images.update(dict.fromkeys(failed_urls))
+
+        buffer = BytesIO()
+        c = canvas.Canvas(buffer, pagesize=(sheet.width, sheet.height))
+        _draw_pages(c, cards, images, sheet)
+        with Metrics.phase("save"):
+            c.save()
+    return buffer.getvalue(), metrics.snapshot() if metrics else None
+
+
+def _create_pdf_incremental(persons: list[Person], sheet: Sheet, output: Union[str, BinaryIO],
+                            card_cache: CardCache, image_fetch_concurrency: int,
+                            progress: Optional[Callable[[int, int], None]] = None) -> tuple[int, list[str]]:
+    """
+    Renders only the cards that are not cached (photos are only fetched for these) and assembles the document from
+    the card fragments, each embedded once as form XObject and placed on the Label or A4 pages (once per copy). The
+    fragments are stored prepared for assembly (see FormFragment), so cached cards are not parsed again. Cards drawn
+    with the placeholder because their photo could not be fetched are not cached.
+    :return: number of reused cards and personnel_nr of the persons drawn with the placeholder. The document
+             reports no deduplicated bytes, the resources every fragment carries are shared as on a single canvas
+    """
+    from src.Helper.PdfStitcher import PdfStitcher  # imported lazily, pypdf is only needed to stitch documents
+
+    keys = [CardCache.key(person, card_width=CARD_WIDTH, card_height=CARD_HEIGHT,
+                          top_bottom_padding=TOP_BOTTOM_PADDING, margin=CARD_FRAGMENT_MARGIN)
+            for person in persons]
+    fragments = {key: _cached_fragment(card_cache, key) for key in keys}
+    cards_reused = sum(fragments[key] is not None for key in keys)
+    missing = {key: person for key, person in zip(keys, persons) if fragments[key] is None}
+    Metrics.count("cards_reused", cards_reused)
+
+    with Metrics.phase("fetch"), ImageFetcher(max_workers=image_fetch_concurrency,
+                                              cache=ImageBlock.image_cache) as fetcher:
+        images = fetcher.prefetch(person.image_url for person in missing.values())
+    placeholders = _placeholders(missing.values(), images)
+    rendered = _render_card_fragments(list(missing.values()), images) if missing else []
+    for (key, person), fragment in zip(missing.items(), rendered):
+        fragments[key] = fragment
+        if not _placeholders([person], images):  # a missing photo is fetched again by the next render
+            card_cache.store(key, fragment.to_bytes())
+
+    keys = [key for key, person in zip(keys, persons) for _ in range(person.copies)]  # key of every card
+    pages, xs, ys = sheet.positions(*LABEL_PAGE_SIZE, 0, len(keys))
+    positions = list(zip(pages.tolist(), xs.tolist(), ys.tolist()))
+
+    out = open(output, "wb") if isinstance(output, str) else output
+    try:
+        with Metrics.phase("assemble"), PdfStitcher(out) as stitcher:
+            forms: dict[str, int] = {}
+            placements = []
+            for idx, (key, (page, x, y)) in enumerate(zip(keys, positions)):
+                if key not in forms:
+                    forms[key] = stitcher.add_form(fragments[key])
+                placements.append((forms[key], x - CARD_FRAGMENT_MARGIN, y - CARD_FRAGMENT_MARGIN))
+                if idx + 1 == len(positions) or positions[idx + 1][0] != page:  # last card of the page
+                    stitcher.add_sheet(sheet.width, sheet.height, placements)
+                    placements = []
+                if progress:
+                    progress(idx + 1, len(keys))
+    finally:
+        if isinstance(output, str):
+            out.close()
+    return cards_reused, placeholders
+
+
+def _cached_fragment(card_cache: CardCache, key: str) -> Optional[FormFragment]:
+    """
+    :return: cached fragment of the card, None if it is not cached or unreadable
+    """
+    if (content := card_cache.get(key)) is None:
+        return None
+    try:
+        return FormFragment.from_bytes(content)
+    except (ValueError, KeyError):
+        return None
+
+
+def _render_card_fragments(persons: list[Person], images: dict[str, ImageReader]) -> list[FormFragment]:
+    """
+    Draws the cards on one canvas, a page per card surrounded by CARD_FRAGMENT_MARGIN, so fonts, icons and card
+    chrome are only drawn and encoded once for all of them.
+    :return: fragment of every card
+    """
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=(LABEL_PAGE_SIZE[0] + 2 * CARD_FRAGMENT_MARGIN,
+                                        LABEL_PAGE_SIZE[1] + 2 * CARD_FRAGMENT_MARGIN))
+    for person in persons:
+        card = Card(c, person, CARD_FRAGMENT_MARGIN, CARD_FRAGMENT_MARGIN, CARD_WIDTH, CARD_HEIGHT,
+                    TOP_BOTTOM_PADDING, images=images)
+        card.draw()
+        c.showPage()
+    with Metrics.phase("save"):
+        c.save()
+    with Metrics.phase("split"):
+        return FormFragment.split(buffer.getvalue())
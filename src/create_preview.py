@@ -1,39 +1,175 @@
-from pdf2image import convert_from_path
-from pydantic import BaseModel
-from reportlab.pdfgen import canvas
-from PIL import Image
-import tempfile
+import math
 import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import BinaryIO, Iterator, Literal, Optional, Union
+
+from PIL import Image
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
 
-from src.FormatClasses import Person
+from src.FormatClasses import BulkPreviewRequest, JpgRequest, Person, SpriteIndex
+from src.FormatClasses.JpgRequest import PREVIEW_DPI
+from src.Helper.ImageFetcher import ImageFetcher
+from src.Helper.Metrics import Metrics
+from src.Helper.RasterCanvas import RasterCanvas
+from src.blocks import ImageBlock
 from src.card.Card import Card
+from src.card.CardDimensions import MM_TO_PT
 
 
 CARD_WIDTH = 100  # mm
 CARD_HEIGHT = 22.45  # mm
 TOP_BOTTOM_PADDING = 1.725  # mm
+IMAGE_FETCH_CONCURRENCY = 8
+PREVIEW_WORKERS = 1  # > 1 rasterizes bulk previews in parallel worker processes
+PREVIEW_CHUNK_SIZE = 10
 
-class JpgRequest(BaseModel):
-    title: str
-    person: Person
+def create_preview(data: JpgRequest, output: Union[str, BinaryIO], dpi: int = PREVIEW_DPI,
+                   fmt: Literal["PNG", "JPEG", "WEBP"] = "PNG", engine: Literal["direct", "poppler"] = "direct"):
+    """
+    :param output: filename without extension (written to the working directory) or a writable binary stream
+    :param dpi: resolution of the preview
+    :param fmt: image format of the preview
+    :param engine: 'direct' rasterizes the card without a pdf, 'poppler' renders a pdf and converts it with pdf2image
+    :return: path of the written image file or the given stream
+    """
+    with Metrics.phase("fetch"), ImageFetcher(max_workers=1, cache=ImageBlock.image_cache) as fetcher:
+        images = fetcher.prefetch([data.person.image_url])
 
-def create_preview(data: JpgRequest, filename=str):
-    with tempfile.TemporaryDirectory() as temp_dir:
-        pdf_path = os.path.join(temp_dir, f"{filename}.pdf")
+    page_size = (CARD_WIDTH * MM_TO_PT, CARD_HEIGHT * MM_TO_PT)
+    if engine == "direct":
+        image = _rasterize_card(data.person, images, dpi)
+    else:
+        from pdf2image import convert_from_bytes  # requires poppler to be installed
 
-        # Generate PDF first
-        c = canvas.Canvas(pdf_path, pagesize=(CARD_WIDTH * 2.834, CARD_HEIGHT * 2.834))
-        card = Card(c, data.person, 0, 0, CARD_WIDTH, CARD_HEIGHT, TOP_BOTTOM_PADDING)
+        # Generate PDF in memory first
+        pdf_buffer = BytesIO()
+        c = canvas.Canvas(pdf_buffer, pagesize=page_size)
+        card = Card(c, data.person, 0, 0, CARD_WIDTH, CARD_HEIGHT, TOP_BOTTOM_PADDING, images=images)
         card.draw()
         c.showPage()
-        c.save()
+        with Metrics.phase("save"):
+            c.save()
+
+        # Convert PDF to image using pdf2image
+        with Metrics.phase("rasterize"):
+            image = convert_from_bytes(pdf_buffer.getvalue(), dpi=dpi)[0]
+
+    image_path = f"./{output}.{fmt.lower()}" if isinstance(output, str) else output
+    start_offset = output.tell() if not isinstance(output, str) else 0
+    with Metrics.phase("encode"):
+        image.save(image_path, fmt)
+
+    if Metrics.enabled():
+        written = os.path.getsize(image_path) if isinstance(image_path, str) else output.tell() - start_offset
+        Metrics.count("bytes_written", written)
+        Metrics.count("previews")
+    return image_path
+
+
+def create_previews(data: BulkPreviewRequest, output: Union[str, BinaryIO], dpi: int = PREVIEW_DPI,
+                    fmt: Literal["PNG", "JPEG", "WEBP"] = "PNG", layout: Literal["zip", "sprite"] = "zip",
+                    thumbnail_size: Optional[tuple[int, int]] = None, sprite_index: SpriteIndex = None,
+                    workers: int = PREVIEW_WORKERS, chunk_size: int = PREVIEW_CHUNK_SIZE):
+    """
+    Rasterizes the cards of all persons (like create_preview with the direct engine).
+    :param output: filename without extension (written to the working directory) or a writable binary stream
+    :param dpi: resolution of the previews
+    :param fmt: image format of every preview (zip) or of the sprite sheet
+    :param layout: 'zip' writes one image per person (named by its index), 'sprite' one image of all cards
+    :param thumbnail_size: maximum width and height (in pxl) of every card, cards are rendered at a lower dpi if
+                           that is sufficient and downscaled to fit
+    :param sprite_index: optional index that is filled with the positions of the cards within the sprite sheet
+    :param workers: number of worker processes rasterizing cards in parallel (1 rasterizes sequentially)
+    :param chunk_size: number of cards rasterized per worker task
+    :return: path of the written file or the given stream
+    """
+    with Metrics.phase("fetch"), ImageFetcher(max_workers=IMAGE_FETCH_CONCURRENCY,
+                                              cache=ImageBlock.image_cache) as fetcher:
+        images = fetcher.prefetch(person.image_url for person in data.persons)
+
+    if thumbnail_size is not None:  # no need to draw more pixels than the thumbnail has
+        page_width, page_height = CARD_WIDTH * MM_TO_PT, CARD_HEIGHT * MM_TO_PT
+        dpi = min(dpi, math.ceil(72 * min(thumbnail_size[0] / page_width, thumbnail_size[1] / page_height)))
+
+    cards = _rasterize_cards(data.persons, images, dpi, thumbnail_size, workers, chunk_size)
+    if layout == "zip":
+        path = f"./{output}.zip" if isinstance(output, str) else output
+        with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_STORED) as archive:  # images are compressed already
+            for idx, card in enumerate(cards):
+                buffer = BytesIO()
+                with Metrics.phase("encode"):
+                    card.save(buffer, fmt)
+                archive.writestr(f"{idx:04d}.{fmt.lower()}", buffer.getvalue())
+    else:
+        path = f"./{output}.{fmt.lower()}" if isinstance(output, str) else output
+        sheet = None
+        index = sprite_index if sprite_index is not None else SpriteIndex()
+        for idx, card in enumerate(cards):
+            if sheet is None:  # all cards have the same size, arrange them in a roughly square grid
+                index.count, index.tile_width, index.tile_height = len(data.persons), *card.size
+                index.columns = max(1, min(index.count, round(math.sqrt(index.count * card.height / card.width))))
+                rows = math.ceil(index.count / index.columns)
+                sheet = Image.new("RGB", (index.columns * card.width, rows * card.height), "white")
+            with Metrics.phase("compose"):
+                sheet.paste(card, index.offset(idx))
+        with Metrics.phase("encode"):
+            (sheet or Image.new("RGB", (1, 1), "white")).save(path, fmt)
+
+    Metrics.count("previews", len(data.persons))
+    return path
+
+
+def _rasterize_card(person: Person, images: dict[str, ImageReader], dpi: int) -> Image.Image:
+    c = RasterCanvas((CARD_WIDTH * MM_TO_PT, CARD_HEIGHT * MM_TO_PT), dpi=dpi)
+    card = Card(c, person, 0, 0, CARD_WIDTH, CARD_HEIGHT, TOP_BOTTOM_PADDING, images=images)
+    card.draw()
+    return c.get_image()
+
+
+def _rasterize_cards(persons: list[Person], images: dict[str, ImageReader], dpi: int,
+                     thumbnail_size: Optional[tuple[int, int]], workers: int,
+                     chunk_size: int) -> Iterator[Image.Image]:
+    """
+    :return: card images in order of the persons, rasterized in worker processes if workers > 1
+    """
+    if workers <= 1 or len(persons) <= chunk_size:
+        for person in persons:
+            yield _to_thumbnail(_rasterize_card(person, images, dpi), thumbnail_size)
+        return
+
+    # photos were prefetched into the disk cache before, so the workers do not hit the network again. Photos that
+    # could not be fetched are not requested again, their cards get the placeholder
+    failed_urls = {url for url, image in images.items() if image is None}
+    chunks = [persons[i:i + chunk_size] for i in range(0, len(persons), chunk_size)]
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as executor:
+        for chunk_cards, chunk_metrics in executor.map(_rasterize_chunk, chunks, [dpi] * len(chunks),
+                                                       [thumbnail_size] * len(chunks), [failed_urls] * len(chunks),
+                                                       [Metrics.enabled()] * len(chunks)):
+            if chunk_metrics:
+                Metrics.current().merge(chunk_metrics)
+            yield from chunk_cards
+
+
+def _rasterize_chunk(persons: list[Person], dpi: int, thumbnail_size: Optional[tuple[int, int]], failed_urls: set[str],
+                     record_metrics: bool = False) -> tuple[list[Image.Image], Optional[dict]]:
+    """
+    Worker task of the parallel bulk preview.
+    :param failed_urls: photos that could not be fetched before, they are not requested again
+    :return: card images and the snapshot of the chunk's metrics (if recorded)
+    """
+    with Metrics.record(record_metrics) as metrics:
+        with Metrics.phase("fetch"), ImageFetcher(max_workers=IMAGE_FETCH_CONCURRENCY,
+                                                  cache=ImageBlock.image_cache) as fetcher:
+            images = fetcher.prefetch(person.image_url for person in persons if person.image_url not in failed_urls)
+        images.update(dict.fromkeys(failed_urls))
+        cards = [_to_thumbnail(_rasterize_card(person, images, dpi), thumbnail_size) for person in persons]
+    return cards, metrics.snapshot() if metrics else None
 
-        # Convert PDF to PNG using pdf2image
-        png_path = os.path.join(temp_dir, f"{filename}.png")
-        images = convert_from_path(pdf_path)
-        images[0].save(png_path, "PNG")  # Save the first page as a PNG
 
-        # Return the path to the PNG file
-        final_path = f"./{filename}.png"
-        os.rename(png_path, final_path)  # Move the file to the desired location
-        return final_path
+def _to_thumbnail(image: Image.Image, thumbnail_size: Optional[tuple[int, int]]) -> Image.Image:
+    if thumbnail_size is not None:
+        image.thumbnail(thumbnail_size, Image.LANCZOS)
+    return image
@@ -0,0 +1,143 @@
+import os
+import queue
+import tempfile
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Literal, Optional
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+@dataclass
+class Job:
+    id: str
+    data: object  # PdfRequest, released once the job is finished
+    paper_size: Literal["A4", "Label"]
+    total: int
+    status: JobStatus = JobStatus.QUEUED
+    rendered: int = 0
+    error: Optional[str] = None
+    pdf_path: Optional[str] = None
+    placeholders: list[str] = field(default_factory=list)  # personnel_nr of persons whose photo could not be fetched
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+    def to_dict(self) -> dict:
+        return {"job_id": self.id,
+                "status": self.status.value,
+                "rendered": self.rendered,
+                "total": self.total,
+                "placeholders": self.placeholders,
+                "error": self.error}
+
+
+class JobManager:
+    """
+    Renders submitted PDF requests in local background worker threads. The queue is bounded, finished PDFs are kept
+    in temp files until they expire.
+    """
+
+    def __init__(self, workers: int = 1, max_queue: int = 16, result_ttl: float = 3600, record_metrics: bool = False,
+                 memory_limit: Optional[int] = None, label_workers: int = 1):
+        """
+        :param workers: number of background worker threads
+        :param max_queue: maximum number of queued (not yet running) jobs
+        :param result_ttl: seconds a finished job and its PDF are kept
+        :param record_metrics: True adds the metrics of every job to Metrics.totals
+        :param memory_limit: renders in the bounded-memory mode of create_pdf with this limit (bytes) if given
+        :param label_workers: worker processes rendering the Label pages of a job in parallel (see create_pdf)
+        """
+        self.workers = workers
+        self.result_ttl = result_ttl
+        self.record_metrics = record_metrics
+        self.memory_limit = memory_limit
+        self.label_workers = label_workers
+        self.jobs: dict[str, Job] = {}
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._threads: list[threading.Thread] = []
+
+    def submit(self, data, paper_size: Literal["A4", "Label"]) -> Job:
+        """
+        :param data: PdfRequest to render
+        :raises JobQueueFull: if the queue is full
+        """
+        self.__expire_jobs()
+        self.__start_workers()
+
+        job = Job(str(uuid.uuid4()), data, paper_size, total=sum(person.copies for person in data.persons))
+        with self._lock:
+            self.jobs[job.id] = job
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                del self.jobs[job.id]
+            raise JobQueueFull(f"Job queue is full ({self._queue.maxsize} jobs)")
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def __start_workers(self):
+        with self._lock:
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self.__work, daemon=True, name=f"render-worker-{len(self._threads)}")
+                thread.start()
+                self._threads.append(thread)
+
+    def __work(self):
+        from src.create_pdf import create_pdf  # imported lazily, loads the whole render stack
+        from src.FormatClasses import RenderReport
+        from src.Helper.Metrics import Metrics
+
+        while True:
+            job = self._queue.get()
+            job.status = JobStatus.RUNNING
+
+            def update_progress(rendered, total):
+                job.rendered = rendered
+
+            report = RenderReport()
+            fd, pdf_path = tempfile.mkstemp(suffix=".pdf", prefix=f"job-{job.id}-")
+            try:
+                with os.fdopen(fd, "wb") as f, Metrics.record(self.record_metrics):
+                    create_pdf(job.data, job.paper_size, f, report=report, progress=update_progress,
+                               memory_limit=self.memory_limit, workers=self.label_workers)
+                job.pdf_path = pdf_path
+                job.placeholders = report.placeholders
+                job.status = JobStatus.DONE
+            except Exception as e:
+                os.remove(pdf_path)
+                job.error = str(e)
+                job.status = JobStatus.FAILED
+            finally:
+                job.data = None
+                job.finished_at = time.time()
+                self._queue.task_done()
+
+    def __expire_jobs(self):
+        now = time.time()
+        with self._lock:
+            expired = [job for job in self.jobs.values()
+                       if job.finished_at is not None and now - job.finished_at > self.result_ttl]
+            for job in expired:
+                del self.jobs[job.id]
+
+        for job in expired:
+            if job.pdf_path and os.path.exists(job.pdf_path):
+                os.remove(job.pdf_path)
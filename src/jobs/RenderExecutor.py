@@ -0,0 +1,104 @@
+import asyncio
+import contextvars
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+
+class RenderQueueFull(Exception):
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RenderExecutor:
+    """
+    Runs the renders of the synchronous endpoints in a bounded pool of worker threads, so the event loop stays free
+    to answer other requests (e.g. CORS preflights) while a render is running. At most max_workers renders run at
+    once and max_queue wait for a thread, further renders are rejected (see RenderQueueFull) instead of queueing up
+    latency.
+    """
+
+    def __init__(self, max_workers: int = 1, max_queue: int = 8):
+        """
+        :param max_workers: number of renders running at once
+        :param max_queue: number of renders waiting for a worker, 0 rejects every render while all workers are busy
+        """
+        if max_workers < 1:
+            raise ValueError(f"max_workers must be at least 1, but is '{max_workers}'")
+
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.pending = 0  # running and waiting renders
+        self.average_duration = None  # moving average of the render durations (in s), to estimate Retry-After
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="render")
+        self._lock = threading.Lock()
+
+    async def run(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """
+        Runs fn in a worker thread (in a copy of the caller's context) and waits for it without blocking the loop.
+        :raises RenderQueueFull: if all workers are busy and the queue is full
+        """
+        self.__acquire()
+        context = contextvars.copy_context()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, self.__timed, context, fn, args,
+                                                                    kwargs)
+        finally:
+            self.__release()
+
+    def iterate(self, iterator: Iterator[T]) -> AsyncIterator[T]:
+        """
+        Advances the iterator in the worker threads (all in one copy of the caller's context), e.g. a streamed render
+        producing its output chunk by chunk. It counts as one render until it is exhausted or closed.
+        :raises RenderQueueFull: if all workers are busy and the queue is full
+        """
+        self.__acquire()
+        return self.__iterate(contextvars.copy_context(), iterator)
+
+    def retry_after(self) -> int:
+        """
+        :return: estimated seconds until a worker is free for another render, at least 1
+        """
+        if self.average_duration is None:
+            return 1
+        waiting = max(0, self.pending - self.max_workers) + 1
+        return max(1, math.ceil(self.average_duration * waiting / self.max_workers))
+
+    def __acquire(self):
+        with self._lock:
+            if self.pending >= self.max_workers + self.max_queue:
+                raise RenderQueueFull(f"Render queue is full ({self.max_queue} renders waiting)", self.retry_after())
+            self.pending += 1
+
+    def __release(self):
+        with self._lock:
+            self.pending -= 1
+
+    async def __iterate(self, context: contextvars.Context, iterator: Iterator[T]) -> AsyncIterator[T]:
+        loop = asyncio.get_running_loop()
+        end = object()
+        start = time.perf_counter()
+        try:
+            while (item := await loop.run_in_executor(self._executor, context.run, next, iterator, end)) is not end:
+                yield item
+            self.__record_duration(time.perf_counter() - start)
+        finally:
+            self.__release()
+
+    def __timed(self, context: contextvars.Context, fn: Callable[..., T], args: tuple, kwargs: dict) -> T:
+        start = time.perf_counter()
+        try:
+            return context.run(fn, *args, **kwargs)
+        finally:
+            self.__record_duration(time.perf_counter() - start)
+
+    def __record_duration(self, duration: float):
+        with self._lock:
+            self.average_duration = duration if self.average_duration is None \
+                else 0.8 * self.average_duration + 0.2 * duration
@@ -0,0 +1,2 @@
+from .JobManager import Job, JobManager, JobQueueFull, JobStatus
+from .RenderExecutor import RenderExecutor, RenderQueueFull
@@ -0,0 +1,90 @@
+import random
+import threading
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from src.FormatClasses import PdfRequest, Person
+from src.params import Params
+
+
+def pytest_addoption(parser):
+    parser.addoption("--run-slow", action="store_true", help="also run tests marked as slow")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "slow: takes minutes, only run with --run-slow")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--run-slow"):
+        return
+    skip_slow = pytest.mark.skip(reason="slow, run with --run-slow")
+    for item in items:
+        if "slow" in item.keywords:
+            item.add_marker(skip_slow)
+
+
+@lru_cache(maxsize=None)
+def photo(idx: int) -> bytes:
+    """
+    :return: JPEG with the pixel dimensions of a FeuerOn photo, distinct per index
+    """
+    stream = BytesIO()
+    Image.new("RGB", (550, 732), ((idx * 37) % 256, (idx * 91) % 256, (idx * 53) % 256)).save(stream, format="JPEG")
+    return stream.getvalue()
+
+
+class _PhotoHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        try:
+            body = photo(int(self.path.strip("/").split(".")[0]))
+        except ValueError:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture(scope="session")
+def photo_server() -> str:
+    """
+    :return: base url of a local server serving photos under '/<idx>.jpg'
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _PhotoHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(scope="session")
+def make_roster(photo_server):
+    """
+    :return: function building a reproducible roster of the given size, every second person with a photo
+    """
+    def make(size: int) -> PdfRequest:
+        rng = random.Random(size)
+        persons = [Person.from_json({
+            "first_name": "Anna",
+            "last_name": f"Muster {idx}",
+            "personnel_nr": str(10000 + idx),
+            "image_url": f"{photo_server}/{idx}.jpg" if idx % 2 == 0 else None,
+            "function": rng.choice(Params.all_functions),
+            "qualifications": rng.sample(Params.all_technical_qualifications, rng.randint(0, 4))
+            + Params.all_leading_qualifications[:rng.randint(0, len(Params.all_leading_qualifications))],
+            "instructions": [{"vehicle": vehicle, "value": rng.random() < 0.5}
+                             for vehicle in rng.sample(["HLF", "TLF", "DLK", "MTW"], rng.randint(1, 4))],
+        }) for idx in range(size)]
+        return PdfRequest(title=f"Roster ({size})", persons=persons)
+
+    return make
@@ -0,0 +1,56 @@
+import tempfile
+import tracemalloc
+
+import pytest
+
+from src.Helper.ImageCache import ImageCache
+from src.Helper.ImageFetcher import ImageFetcher
+from src.blocks import ImageBlock
+from src.create_pdf import create_pdf
+
+MEMORY_LIMIT = 512 * 1024
+SMALL_ROSTER, LARGE_ROSTER = 100, 5000
+COMPARED_ROSTER = 400  # compared against the unbounded mode, which holds the whole document
+RENDER_OVERHEAD = 5 * 512 * 1024  # photos of the current batch, working memory of reportlab and pypdf
+GROWTH_TOLERANCE = 1024 ** 2  # stitcher bookkeeping (offsets, digests) grows with the document
+
+
+@pytest.fixture(autouse=True)
+def image_cache(monkeypatch):
+    monkeypatch.setattr(ImageBlock, "image_cache", ImageCache(cache_dir=tempfile.mkdtemp(prefix="test-image-cache-")))
+
+
+def peak_memory(data, paper_size: str, memory_limit=None) -> int:
+    """
+    :return: peak of the memory allocated by Python while rendering the roster (in bytes). All photos are cached on
+             disk (without the fetch deadline of a render) and the roster is rendered once before, so neither downloads
+             nor memoized layouts and QR codes count.
+    """
+    with ImageFetcher(cache=ImageBlock.image_cache, deadline=None) as fetcher:
+        fetcher.prefetch(person.image_url for person in data.persons)
+    with tempfile.TemporaryFile() as output:
+        create_pdf(data, paper_size, output, memory_limit=memory_limit)
+
+    tracemalloc.start()
+    try:
+        with tempfile.TemporaryFile() as output:
+            create_pdf(data, paper_size, output, memory_limit=memory_limit)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("paper_size", ["A4", "Label"])
+def test_bounded_memory_does_not_grow_with_roster(paper_size, make_roster):
+    small = peak_memory(make_roster(SMALL_ROSTER), paper_size, MEMORY_LIMIT)
+    large = peak_memory(make_roster(LARGE_ROSTER), paper_size, MEMORY_LIMIT)
+    assert large - small <= GROWTH_TOLERANCE, f"peak grew from {small} to {large} bytes"
+
+
+def test_bounded_memory_stays_below_unbounded(make_roster):
+    data = make_roster(COMPARED_ROSTER)
+    bounded = peak_memory(data, "A4", MEMORY_LIMIT)
+    unbounded = peak_memory(data, "A4")
+    assert bounded <= MEMORY_LIMIT + RENDER_OVERHEAD, f"peak of {bounded} bytes with a limit of {MEMORY_LIMIT} bytes"
+    assert bounded < unbounded / 2